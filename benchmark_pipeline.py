@@ -0,0 +1,296 @@
+#%%
+
+# Imports
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import pandas as pd
+# Helper functions and global constants
+from csv_creator import create_csv_files
+from filter_list_creator import filter_dct_creator
+from format_evaluations import format_evaluations_batch
+from format_grades import format_grades_batch
+from format_info import format_info
+from format_study_lines import create_teacher_course_lst
+from pipeline_logging import pipeline_logging
+from utils import Utils
+from website.global_constants.config import Config
+from website.global_constants.dtu_consts import DtuConsts
+from website.global_constants.file_name_consts import FileNameConsts
+from website.global_constants.info_consts import InfoConsts
+
+
+# Initialization
+COURSE = FileNameConsts.df_index
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+SCRAPED_DATA_FOLDER = os.path.join(REPO_FOLDER, FileNameConsts.scraped_data_folder_name)
+INFO_VALUES_FOLDER = os.path.join(REPO_FOLDER, 'test_stuff', 'infoDictTest') # Each value of an info key in a real scrape, and how often it was seen
+BASELINE_LOCATION = os.path.join(REPO_FOLDER, FileNameConsts.log_folder_name, 'pipeline_benchmark_baseline.json')
+RESULTS_LOCATION = os.path.join(REPO_FOLDER, FileNameConsts.log_folder_name, 'pipeline_benchmark_timings.json')
+
+# Responsible name and pic keys of the scraped info, main responsible first
+RESPONSIBLE_KEYS = [(DtuConsts.dtu_name_of_main_responsible, DtuConsts.dtu_pic_of_main_responsible),
+                    (DtuConsts.dtu_name_of_co_responsible_1, DtuConsts.dtu_pic_of_co_responsible_1),
+                    (DtuConsts.dtu_name_of_co_responsible_2, DtuConsts.dtu_pic_of_co_responsible_2),
+                    (DtuConsts.dtu_name_of_co_responsible_3, DtuConsts.dtu_pic_of_co_responsible_3),
+                    (DtuConsts.dtu_name_of_co_responsible_4, DtuConsts.dtu_pic_of_co_responsible_4)]
+
+# Scraped text keys that have no recorded values, they are filled with a short text
+TEXT_KEYS = [DtuConsts.dtu_general_course_objectives, DtuConsts.dtu_learning_objectives, DtuConsts.dtu_content]
+
+
+class SyntheticCatalogue:
+    """ A catalogue of scale times the scraped courses. The scraped grades and evaluations of every course are
+        copied under new course numbers (01005, 01005-1, 01005-2, ...). The scraped info is drawn from the values
+        recorded in a real info scrape, weighted by how often each value was seen, so the formatting code takes
+        realistic branches. The same scale and seed always gives the same catalogue """
+
+    def __init__(self, scale, seed=0):
+        self.scale = scale
+        with open(os.path.join(SCRAPED_DATA_FOLDER, FileNameConsts.course_number_json + '.json')) as f:
+            course_dct = json.load(f)
+        base_courses = list(course_dct.keys())
+        self.course_numbers = [self.copy_of_course(course, copy) for copy in range (0, scale) for course in base_courses]
+        self.course_names = [course_dct[course] for copy in range (0, scale) for course in base_courses]
+
+        base_info_df = pd.DataFrame(create_info_rows(base_courses, seed))
+        self.grade_df = self.copy_df(pd.read_pickle(os.path.join(SCRAPED_DATA_FOLDER, FileNameConsts.grade_df + '.pkl')), base_courses)
+        self.eval_df = self.copy_df(pd.read_pickle(os.path.join(SCRAPED_DATA_FOLDER, FileNameConsts.eval_df + '.pkl')), base_courses)
+        self.info_df = self.copy_df(base_info_df.set_index(COURSE, drop=False), base_courses)
+
+
+    def __len__(self):
+        return len(self.course_numbers)
+
+
+    @staticmethod
+    def copy_of_course(course, copy):
+        """Return the course number of a copy of course, the first copy is the course itself"""
+        return course if copy == 0 else f'{course}-{copy}'
+
+
+    def copy_df(self, df, base_courses):
+        """Return a df with a row for every course of the catalogue, copied from the scraped df"""
+        df = df.loc[base_courses].reset_index(drop=True)
+        copies = []
+        for copy in range (0, self.scale):
+            copies.append(df.assign(**{COURSE: [self.copy_of_course(course, copy) for course in base_courses]}))
+        df = pd.concat(copies, ignore_index=True)
+        df.set_index(COURSE, inplace=True, drop=False)
+        return df
+
+
+    def save(self):
+        """Save the catalogue in the scraped_data folder of the current directory, as the scrapers would"""
+        Utils.save_scraped_df(self.grade_df.copy(), FileNameConsts.grade_df)
+        Utils.save_scraped_df(self.eval_df.copy(), FileNameConsts.eval_df)
+        Utils.save_scraped_df(self.info_df.copy(), FileNameConsts.info_df)
+        with open(f'{FileNameConsts.scraped_data_folder_name}/{FileNameConsts.course_number_json}.json', 'w') as f:
+            json.dump(dict(zip(self.course_numbers, self.course_names)), f)
+        # Files built from an earlier catalogue
+        for folder_name in [FileNameConsts.path_of_csv, FileNameConsts.path_of_pkl]:
+            shutil.rmtree(folder_name, ignore_errors=True)
+            Utils.create_folder(folder_name)
+
+
+def create_info_rows(course_numbers, seed):
+    """Return list of a scraped info row for each course, drawn from the values recorded in a real info scrape"""
+    rng = random.Random(seed)
+
+    # Recorded values of each scraped key, e.g. {'Language of instruction': {'English': 1021, 'Danish': 656}}
+    value_counts = {}
+    for key in InfoConsts.scrape_info_column_names:
+        file_location = os.path.join(INFO_VALUES_FOLDER, key + '.json')
+        if os.path.exists(file_location) and key not in value_counts:
+            with open(file_location, encoding='utf-8') as f:
+                value_counts[key] = json.load(f)
+
+    # Teachers are the names of the recorded main responsibles, e.g. 'Karsten Schmidt , Lyngby Campus, ...'
+    teachers = list(dict.fromkeys(value.split(' ,')[0] for value in value_counts[DtuConsts.dtu_responsible]))
+    study_lines = InfoConsts.study_lines.values_raw
+
+    info_rows = []
+    for course in course_numbers:
+        info_row = {COURSE: course}
+        for key, counts in value_counts.items():
+            info_row[key] = rng.choices(list(counts.keys()), weights=list(counts.values()))[0]
+        for key in TEXT_KEYS:
+            info_row[key] = f'{key} of course {course}.'
+        info_row[DtuConsts.dtu_last_updated] = '1 May 2022'
+        info_row[DtuConsts.dtu_remarks] = DtuConsts.dtu_no_remarks
+        # Same format as the study lines of the course page, a javascript list
+        info_row[DtuConsts.dtu_accosiated_study_lines] = str(rng.sample(study_lines, rng.randint(0, 4)))
+        responsibles = rng.sample(teachers, rng.randint(1, len(RESPONSIBLE_KEYS)))
+        for i in range (0, len(RESPONSIBLE_KEYS)):
+            name_key, pic_key = RESPONSIBLE_KEYS[i]
+            if i < len(responsibles):
+                info_row[name_key] = responsibles[i]
+                info_row[pic_key] = f'https://www.dtu.dk/-/media/{teachers.index(responsibles[i])}.jpg'
+            else:
+                info_row[name_key] = DtuConsts.dtu_no_data_for_responsible
+                info_row[pic_key] = DtuConsts.dtu_no_data_for_responsible
+        info_rows.append(info_row)
+    return info_rows
+
+
+#%%
+
+# Benchmark cases. Each case takes the saved catalogue, does its setup and returns the function that is timed
+
+def benchmark_format_grades(catalogue):
+    grade_df = Utils.load_scraped_df(FileNameConsts.grade_df)
+    return lambda: format_grades_batch(grade_df, catalogue.course_numbers, Config.course_semesters, FileNameConsts.grade_format)
+
+
+def benchmark_format_evaluations(catalogue):
+    eval_df = Utils.load_scraped_df(FileNameConsts.eval_df)
+    return lambda: format_evaluations_batch(eval_df, catalogue.course_numbers, Config.course_semesters, FileNameConsts.eval_format)
+
+
+def benchmark_format_info(catalogue):
+    info_df = Utils.load_scraped_df(FileNameConsts.info_df)
+    columns = list(info_df.columns)
+    scraped_info = [dict(zip(columns, row)) for row in info_df.itertuples(index=False, name=None)]
+    def run():
+        for i in range (0, len(catalogue.course_numbers)):
+            format_info(scraped_info[i], catalogue.course_numbers[i], FileNameConsts.info_format)
+    return run
+
+
+def benchmark_create_teacher_course_lst(catalogue):
+    # The responsible names are the same in the scraped info and the formatted df
+    name_columns = {InfoConsts.main_responsible_name.key_raw: InfoConsts.main_responsible_name.key_df,
+                    InfoConsts.co_responsible_1_name.key_raw: InfoConsts.co_responsible_1_name.key_df,
+                    InfoConsts.co_responsible_2_name.key_raw: InfoConsts.co_responsible_2_name.key_df,
+                    InfoConsts.co_responsible_3_name.key_raw: InfoConsts.co_responsible_3_name.key_df,
+                    InfoConsts.co_responsible_4_name.key_raw: InfoConsts.co_responsible_4_name.key_df}
+    df = Utils.load_scraped_df(FileNameConsts.info_df)[list(name_columns)].rename(columns=name_columns)
+    return lambda: create_teacher_course_lst(df, catalogue.course_numbers)
+
+
+def benchmark_filter_dct_creator(catalogue):
+    # filter_dct_creator reads the extended pickle made by csv_creator
+    if not os.path.exists(FileNameConsts.path_of_pkl + FileNameConsts.extended_pkl_name + ".pkl"):
+        create_csv_files(catalogue.course_numbers, catalogue.course_names)
+    return filter_dct_creator
+
+
+def benchmark_csv_creator(catalogue):
+    # Each run is a full build into empty folders
+    catalogue.save()
+    return lambda: create_csv_files(catalogue.course_numbers, catalogue.course_names)
+
+
+BENCHMARK_CASES = {'format_grades': benchmark_format_grades,
+                   'format_evaluations': benchmark_format_evaluations,
+                   'format_info': benchmark_format_info,
+                   'create_teacher_course_lst': benchmark_create_teacher_course_lst,
+                   'filter_dct_creator': benchmark_filter_dct_creator,
+                   'csv_creator': benchmark_csv_creator}
+
+
+#%%
+
+def run_benchmarks(case_names, scales, repeats):
+    """ Run each case repeats times on each catalogue and return {case@xscale: result}.
+        Everything runs in a temporary folder, so the scraped data and the website files are never touched """
+    results = {}
+    work_folder = tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    try:
+        os.chdir(work_folder)
+        for scale in scales:
+            print(f"Creating synthetic catalogue x{scale}...")
+            catalogue = SyntheticCatalogue(scale)
+            catalogue.save()
+            print(f"Catalogue x{scale} has {len(catalogue)} courses")
+            for case_name in case_names:
+                run_times = []
+                for _ in range (0, repeats):
+                    # The pipeline prints progress for every course, which is not what is measured
+                    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                        run = BENCHMARK_CASES[case_name](catalogue)
+                        gc.collect()
+                        start = time.perf_counter()
+                        run()
+                        run_times.append(time.perf_counter() - start)
+                result = {'courses': len(catalogue),
+                          'median': round(statistics.median(run_times), 6),
+                          'min': round(min(run_times), 6),
+                          'runs': [round(run_time, 6) for run_time in run_times]}
+                results[f'{case_name}@x{scale}'] = result
+                print(f"  {case_name:<28}{result['median']:>10.3f} s (median of {repeats})")
+    finally:
+        os.chdir(REPO_FOLDER)
+        pipeline_logging.stop()
+        shutil.rmtree(work_folder, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Print each result next to its baseline, and return the list of cases that are more than tolerance slower"""
+    regressions = []
+    print()
+    print(f"{'case':<36}{'courses':>9}{'median':>11}{'courses/s':>12}{'baseline':>11}{'change':>9}")
+    for case, result in results.items():
+        line = f"{case:<36}{result['courses']:>9}{result['median']:>9.3f} s{result['courses'] / result['median']:>12.0f}"
+        if case in baseline:
+            change = result['median'] / baseline[case]['median'] - 1
+            line += f"{baseline[case]['median']:>9.3f} s{change * 100:>+8.1f}%"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressions.append(case)
+        else:
+            line += f"{'-':>11}{'-':>9}  (no baseline)"
+        print(line)
+    return regressions
+
+
+def load_baseline(file_location):
+    if not os.path.exists(file_location):
+        return {}
+    with open(file_location) as f:
+        return json.load(f)['cases']
+
+
+def save_results(file_location, results):
+    """Save results as json, with the machine they were measured on (timings of different machines can not be compared)"""
+    os.makedirs(os.path.dirname(file_location), exist_ok=True)
+    report = {'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'machine': {'python': platform.python_version(), 'pandas': pd.__version__, 'platform': platform.platform(), 'processor': platform.processor()},
+              'cases': results}
+    with open(file_location, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+#%%
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the formatting and build pipeline on synthetic catalogues, and compare with the saved baseline')
+    parser.add_argument('--cases', nargs='+', choices=list(BENCHMARK_CASES), default=list(BENCHMARK_CASES), help='cases to run (default: all)')
+    parser.add_argument('--scales', nargs='+', type=int, default=Config.benchmark_scales, help='catalogue sizes, as multiples of the scraped courses')
+    parser.add_argument('--repeats', type=int, default=Config.benchmark_repeats, help='runs of each case, the median is compared')
+    parser.add_argument('--tolerance', type=float, default=Config.benchmark_tolerance, help='share a case may be slower than its baseline')
+    parser.add_argument('--baseline', default=BASELINE_LOCATION, help='baseline json file')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline of the cases that were run')
+    args = parser.parse_args()
+
+    RESULTS = run_benchmarks(args.cases, args.scales, args.repeats)
+    save_results(RESULTS_LOCATION, RESULTS)
+    BASELINE = load_baseline(args.baseline)
+    REGRESSIONS = compare_with_baseline(RESULTS, BASELINE, args.tolerance)
+
+    if args.save_baseline:
+        # Cases that were not run keep their old baseline
+        save_results(args.baseline, {**BASELINE, **RESULTS})
+        print(f"\nBaseline saved as {args.baseline}")
+    elif REGRESSIONS != []:
+        print(f"\n{len(REGRESSIONS)} case(s) are more than {args.tolerance * 100:.0f}% slower than the baseline: {', '.join(REGRESSIONS)}")
+        sys.exit(1)
@@ -0,0 +1,239 @@
+#%%
+
+# Imports
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+# Helper functions and global constants
+from instrumentation import Instrumentation
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+from website.global_constants.website_consts import WebsiteConsts
+
+
+# Initialization
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+RESULTS_LOCATION = os.path.join(REPO_FOLDER, FileNameConsts.log_folder_name, 'website_load_test_timings.json')
+COURSE_RECORDS_LOCATIONS = [FileNameConsts.path_of_pkl + FileNameConsts.course_table_name + ".bin",
+                            FileNameConsts.path_of_pkl + FileNameConsts.name_of_pkl + ".pkl"]
+
+# Share of the requests sent to each route
+REQUEST_MIX = {'home': 0.15, 'browse': 0.5, 'course': 0.3, 'random': 0.05}
+BROWSE_QUERIES = 200 # Distinct browse queries in a mix, so some are served from the page cache and some are not
+
+
+def create_request_mix(store, requests, seed=0):
+    """ Return list of (route, path) of requests, drawn from REQUEST_MIX. Browse queries combine 0-3 filter
+        catagories of the filter dict (several values of a catagory are allowed, as on the browse page), mostly with a sort_by """
+    rng = random.Random(seed)
+    filter_dct = store.get(WebsiteConsts.json_filter_dct)
+    catagories = [catagory for catagory in filter_dct if filter_dct[catagory] != {}]
+    sort_catagories = list(WebsiteConsts.json_as_sort_catagory)
+
+    browse_paths = []
+    for _ in range (0, BROWSE_QUERIES):
+        # Browse url args are value=catagory, e.g. /browse?eng=language&msc=course_type&sort_by=course_grade
+        url_args = []
+        for catagory in rng.sample(catagories, rng.randint(0, min(3, len(catagories)))):
+            values = list(filter_dct[catagory])
+            for value in rng.sample(values, rng.randint(1, min(2, len(values)))):
+                url_args.append((value, catagory))
+        if rng.random() < 0.8:
+            url_args.append((WebsiteConsts.sort_by, rng.choice(sort_catagories)))
+        browse_paths.append('/browse?' + urlencode(url_args))
+
+    courses = list(store.course_numbers)
+    routes = rng.choices(list(REQUEST_MIX), weights=list(REQUEST_MIX.values()), k=requests)
+    request_mix = []
+    for route in routes:
+        if route == 'home':
+            path = '/'
+        elif route == 'browse':
+            path = rng.choice(browse_paths)
+        elif route == 'course':
+            path = f'/course/{rng.choice(courses)}'
+        else:
+            path = '/random/'
+        request_mix.append((route, path))
+    return request_mix
+
+
+#%%
+
+def run_test_client(app, request_mix):
+    """Send request_mix one request at a time through Flask's test client, and return the latency of each route"""
+    instrumentation = Instrumentation()
+    client = app.test_client()
+    for route, path in request_mix:
+        with instrumentation.item('all requests'), instrumentation.item(route):
+            response = client.get(path)
+        instrumentation.count(route, f'status_{response.status_code}')
+    return instrumentation.report()
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """wsgiref server that handles each request in its own thread"""
+    daemon_threads = True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that does not print a line for every request"""
+    def log_message(self, format, *args):
+        pass
+
+
+def run_wsgi_server(app, request_mix, concurrency):
+    """ Serve the app with a local wsgi server, send request_mix from concurrency clients over http,
+        and return the latency of each route """
+    server = make_server('127.0.0.1', 0, app, server_class=ThreadingWSGIServer, handler_class=QuietRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    instrumentation = Instrumentation()
+
+    def send_requests(requests):
+        for route, path in requests:
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=60)
+            with instrumentation.item('all requests'), instrumentation.item(route):
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+            connection.close()
+            instrumentation.count(route, f'status_{response.status}')
+
+    try:
+        clients = [threading.Thread(target=send_requests, args=(request_mix[i::concurrency],)) for i in range (0, concurrency)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return instrumentation.report()
+
+
+def measure_allocations(app, request_mix):
+    """ Send request_mix through the test client with tracemalloc on, and return the average memory allocated
+        at the peak of a request (peak_kib) and still held after it (retained_kib, e.g. by the page cache) for each route """
+    client = app.test_client()
+    allocations = {}
+    tracemalloc.start()
+    try:
+        for route, path in request_mix:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            client.get(path)
+            after, peak = tracemalloc.get_traced_memory()
+            allocations.setdefault(route, []).append((peak - before, after - before))
+    finally:
+        tracemalloc.stop()
+    summary = {}
+    for route, sizes in allocations.items():
+        summary[route] = {'requests': len(sizes),
+                          'peak_kib': round(sum(size[0] for size in sizes) / len(sizes) / 1024, 1),
+                          'retained_kib': round(sum(size[1] for size in sizes) / len(sizes) / 1024, 1)}
+    return summary
+
+
+#%%
+
+@contextlib.contextmanager
+def synthetic_website(scale):
+    """ Build the website's files from a synthetic catalogue of scale times the scraped courses (see benchmark_pipeline),
+        in a temporary folder that is the working directory while the website runs """
+    # The build is only imported when needed, as it imports pandas
+    from benchmark_pipeline import SyntheticCatalogue
+    from csv_creator import create_csv_files
+    from pipeline_logging import pipeline_logging
+    work_folder = tempfile.mkdtemp(prefix='website_benchmark_')
+    try:
+        os.chdir(work_folder)
+        print(f"Building a website from a synthetic catalogue x{scale}...")
+        catalogue = SyntheticCatalogue(scale)
+        catalogue.save()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            create_csv_files(catalogue.course_numbers, catalogue.course_names)
+        pipeline_logging.stop()
+        yield
+    finally:
+        os.chdir(REPO_FOLDER)
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+def print_latency_report(driver_name, report):
+    print(f"{driver_name}:")
+    for route in [route for route in list(REQUEST_MIX) + ['all requests'] if route in report]:
+        summary = report[route]
+        line = f"  {route:<16}{summary['items']:>7} requests {summary['items_per_second']:>9.1f}/s"
+        line += f"   p50 {summary['p50'] * 1000:>7.2f} ms, p95 {summary['p95'] * 1000:>7.2f} ms, p99 {summary['p99'] * 1000:>7.2f} ms, max {summary['max'] * 1000:>7.2f} ms"
+        errors = sum(count for counter, count in summary.get('counters', {}).items() if int(counter[len('status_'):]) >= 500)
+        if errors > 0:
+            line += f"   {errors} server errors"
+        print(line)
+
+
+def print_allocation_report(allocations):
+    print("Allocations per request (tracemalloc):")
+    for route in [route for route in REQUEST_MIX if route in allocations]:
+        summary = allocations[route]
+        print(f"  {route:<16}{summary['requests']:>7} requests   peak {summary['peak_kib']:>9.1f} KiB, retained {summary['retained_kib']:>8.1f} KiB")
+
+
+def run_load_test(requests, concurrency, allocation_requests, page_cache_enabled):
+    """Create the website, run each driver on the same request mix and return the reports"""
+    from website import create_app
+    from website.data_store import data_store
+    from website.page_cache import page_cache
+    app = create_app()
+    if not page_cache_enabled:
+        page_cache.max_bytes = 0
+    request_mix = create_request_mix(data_store, requests)
+    reports = {'requests': requests, 'concurrency': concurrency, 'page_cache': page_cache_enabled, 'courses': len(data_store.course_numbers)}
+
+    # Every driver starts with an empty page cache
+    reports['test_client'] = run_test_client(app, request_mix)
+    print_latency_report("Flask test client", reports['test_client'])
+    page_cache.clear()
+    reports['wsgi_server'] = run_wsgi_server(app, request_mix, concurrency)
+    print_latency_report(f"Local wsgi server, {concurrency} clients", reports['wsgi_server'])
+    page_cache.clear()
+    reports['allocations'] = measure_allocations(app, request_mix[:allocation_requests])
+    print_allocation_report(reports['allocations'])
+    return reports
+
+
+#%%
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the website offline, with Flask\'s test client and a local wsgi server')
+    parser.add_argument('--requests', type=int, default=Config.load_test_requests, help='requests sent by each driver')
+    parser.add_argument('--concurrency', type=int, default=Config.load_test_concurrency, help='clients sending requests to the wsgi server at the same time')
+    parser.add_argument('--allocation-requests', type=int, default=500, help='requests measured with tracemalloc (it slows requests down, so it runs separately)')
+    parser.add_argument('--no-page-cache', action='store_true', help='render every page, to measure what the page cache saves')
+    parser.add_argument('--synthetic', type=int, metavar='SCALE', help='serve a synthetic catalogue of SCALE times the scraped courses '
+                                                                      '(the default, with SCALE 1, when the published files have no course records)')
+    args = parser.parse_args()
+
+    if args.synthetic is None and not any(os.path.exists(location) for location in COURSE_RECORDS_LOCATIONS):
+        print("The published website files have no course records, a synthetic catalogue is served instead")
+        args.synthetic = 1
+    if args.synthetic is not None:
+        with synthetic_website(args.synthetic):
+            REPORTS = run_load_test(args.requests, args.concurrency, args.allocation_requests, not args.no_page_cache)
+    else:
+        REPORTS = run_load_test(args.requests, args.concurrency, args.allocation_requests, not args.no_page_cache)
+
+    os.makedirs(os.path.dirname(RESULTS_LOCATION), exist_ok=True)
+    with open(RESULTS_LOCATION, 'w') as f:
+        json.dump({'finished': time.strftime('%Y-%m-%d %H:%M:%S'), **REPORTS}, f, indent=2)
+    print(f"Results saved as {RESULTS_LOCATION}")
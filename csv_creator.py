@@ -1,16 +1,22 @@
 #%%
 
 # Imports
+import argparse
 import pandas as pd
 import json
+import os
 from pandas.io.parsers import read_csv
 # Helper functions and global constants
 from filter_list_creator import filter_dct_to_json
-from format_evaluations import format_evaluations
-from format_grades import format_grades
+from format_cache import FormatCache
+from format_evaluations import format_evaluations_batch
+from format_grades import format_grades_batch
 from format_info import format_info
 from format_study_lines import create_teacher_course_lst
-from utils import Utils
+from instrumentation import instrumentation
+from search_index_creator import search_index_to_json
+from utils import DfRowBuilder, Utils
+from website.course_records import CourseTable, create_course_records
 from website.global_constants import website_consts
 from website.global_constants.config import Config
 from website.global_constants.eval_consts import EvalConsts
@@ -24,9 +30,50 @@ from website.global_constants.website_consts import WebsiteConsts
 COURSE = FileNameConsts.df_index
 NAME = InfoConsts.name_english
 
+# Define columns in the smaller of the two CSV-files
+BASIC_COLUMNS = [InfoConsts.danish_name.key_df, InfoConsts.language.key_df, InfoConsts.ects_points.key_df, InfoConsts.course_type.key_df,
+                 GradeConsts.students_per_semester, InfoConsts.semester_period.key_df, InfoConsts.exam_type.key_df,
+                 InfoConsts.assignments.key_df, InfoConsts.time_of_week.key_df, InfoConsts.last_updated.key_df]
 
-def csv_creator(course_numbers, course_names, name_and_path_of_csv, name_and_path_of_pkl, premade_columns):
-    """Create and save .csv file with data for all courses"""
+GRADE_COLUMNS = [GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4, GradeConsts.grade_02,
+                 GradeConsts.grade_00, GradeConsts.grade_minus_3, GradeConsts.grade_passed, GradeConsts.grade_failed,
+                 GradeConsts.grade_absent, GradeConsts.grade_average, GradeConsts.students_total, GradeConsts.percent_passed,
+                 GradeConsts.percent_failed, GradeConsts.percent_absent]
+
+EVAL_COLUMNS = [EvalConsts.rating_tier, EvalConsts.rating_average_score, EvalConsts.rating_votes,
+                EvalConsts.learning_tier, EvalConsts.learning_average_score, EvalConsts.learning_votes,
+                EvalConsts.motivation_tier, EvalConsts.motivation_average_score, EvalConsts.motivation_votes,
+                EvalConsts.feedback_tier, EvalConsts.feedback_average_score, EvalConsts.feedback_votes,
+                EvalConsts.workload_tier, EvalConsts.workload_average_score, EvalConsts.workload_votes, EvalConsts.workload_4_star, EvalConsts.workload_5_star]
+
+RESPONSIBLE_COLUMNS =  [InfoConsts.main_responsible_name.key_df, InfoConsts.main_responsible_pic.key_df,
+                        InfoConsts.co_responsible_1_name.key_df, InfoConsts.co_responsible_1_pic.key_df,
+                        InfoConsts.co_responsible_2_name.key_df, InfoConsts.co_responsible_2_pic.key_df,
+                        InfoConsts.co_responsible_3_name.key_df, InfoConsts.co_responsible_3_pic.key_df,
+                        InfoConsts.co_responsible_4_name.key_df, InfoConsts.co_responsible_4_pic.key_df]
+
+CONTENT_COLUMNS =  [InfoConsts.course_description.key_df, InfoConsts.scope_and_form.key_df, (InfoConsts.exam_type.key_df)+'_'+InfoConsts.raw_key,
+                    (InfoConsts.exam_aid.key_df)+'_'+InfoConsts.raw_key, (InfoConsts.location.key_df)+'_'+InfoConsts.raw_key, InfoConsts.time_of_week_updated.key_df,
+                    InfoConsts.exam_duration.key_df, InfoConsts.home_page.key_df, InfoConsts.learning_objectives.key_df, InfoConsts.course_content.key_df, InfoConsts.remarks.key_df,
+                    InfoConsts.recommended_prerequisites.key_df, InfoConsts.mandatory_prerequisites.key_df, InfoConsts.study_lines.key_df, GradeConsts.semesters_total, InfoConsts.institute.key_df]
+
+SEMESTER_ELEMENTS = [GradeConsts.students_total, GradeConsts.grade_average, GradeConsts.percent_failed,
+                     GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4, GradeConsts.grade_02, GradeConsts.grade_00, GradeConsts.grade_minus_3,
+                     EvalConsts.learning_votes, EvalConsts.workload_average_score, EvalConsts.learning_average_score,
+                     EvalConsts.motivation_average_score, EvalConsts.feedback_average_score]
+
+SEMESTER_COLUMNS = Utils.generate_columns(Config.course_semesters, SEMESTER_ELEMENTS, add_index = False)
+
+PREMADE_COLUMNS = BASIC_COLUMNS + GRADE_COLUMNS + EVAL_COLUMNS + RESPONSIBLE_COLUMNS + CONTENT_COLUMNS + SEMESTER_COLUMNS # If adding a new column_name, be sure to add it to format info script as well!
+
+
+@instrumentation.timed('create_course_df')
+def create_course_df(course_numbers, course_names, incremental=False):
+    """ Format grades, evaluations and info for all courses exactly once, and return them as a single wide df.
+        The columns are course number, name and every formatted key, in the order they first appear.
+        If incremental is True, only courses whose scraped data changed since the last build are formatted,
+        the rest come from the format cache. Also returns the list of courses that were formatted,
+        and the list of courses of the last build that are no longer in course_numbers """
 
     # Open scraped grades df
     grade_df_location = FileNameConsts.grade_df
@@ -43,47 +90,83 @@ def csv_creator(course_numbers, course_names, name_and_path_of_csv, name_and_pat
     info_df = Utils.load_scraped_df(info_df_location)
     info_file_name = FileNameConsts.info_format
 
-    # Adding data dicts to the data frame, one course at a time
-    semesters = Config.course_semesters
+    def rows_as_dicts(df):
+        """Return {index: row dict} for a formatted df (faster than df.to_dict('index'))"""
+        columns = list(df.columns)
+        return {index: dict(zip(columns, row)) for index, row in zip(df.index, df.itertuples(index=False, name=None))}
+
+    # Fingerprint the scraped data of each course, and find the courses that have changed since the last build
+    format_cache = FormatCache(incremental=incremental)
+    scraped_grades = rows_as_dicts(grade_df.loc[course_numbers])
+    scraped_evals = rows_as_dicts(eval_df.loc[course_numbers])
+    scraped_info = rows_as_dicts(info_df.loc[course_numbers])
+    fingerprints = {}
+    changed_courses = []
     for i in range (0, len(course_numbers)):
-        scraped_grades = grade_df.loc[course_numbers[i]].to_dict()
-        scraped_evals = eval_df.loc[course_numbers[i]].to_dict()
-        scraped_info = info_df.loc[course_numbers[i]].to_dict()
-        formatted_grades_dct = format_grades(scraped_grades, course_numbers[i], semesters, grade_file_name)
-        formatted_evals_dct = format_evaluations(scraped_evals, course_numbers[i], semesters, eval_file_name)
-        formatted_info_dct = format_info(scraped_info, course_numbers[i], info_file_name)
-
-        data_dct = {**formatted_grades_dct, **formatted_evals_dct, **formatted_info_dct}
-
-        # Create list with column names, this will be the data frame columns
-        if i == 0:
-            if premade_columns == []:
-                column_names = [COURSE] + [NAME] + list(data_dct.keys())
-            else:
-                column_names = [COURSE] + [NAME] + premade_columns
-        # Create a dictionary with one value for each column in the data frame
-        df_input = {COURSE: [str(course_numbers[i])], NAME: [str(course_names[i])]}
-        for j in range(2, len(column_names)):
-            if str(column_names[j]) in data_dct:
-                df_input[str(column_names[j])] = [data_dct[column_names[j]]]
-            else:
-                df_input[str(column_names[j])] = [None]
-
-        # On first loop, create df, then add a new row to data frame on each loop
-        if i == 0:
-            df = pd.DataFrame(data = df_input)
-        else:
-            new_df_row = pd.DataFrame(data = df_input)
-            df = pd.concat([df, new_df_row], ignore_index=True)
-
-        #df = df.append(new_csv_row, ignore_index=True)
+        course = course_numbers[i]
+        fingerprints[course] = FormatCache.fingerprint(str(course_names[i]), scraped_grades[course], scraped_evals[course], scraped_info[course])
+        if not format_cache.is_current(course, fingerprints[course]):
+            changed_courses.append(course)
+    removed_courses = [course for course in format_cache.fingerprints if course not in fingerprints]
+    message = f"{FileNameConsts.name_of_csv}: {len(changed_courses)} of {len(course_numbers)} courses must be formatted, {len(removed_courses)} courses were removed"
+    Utils.logger(message, 'info', FileNameConsts.format_log_name)
+
+    # Grades and evaluations are formatted for all changed courses at once
+    semesters = Config.course_semesters
+    with instrumentation.stage('format_grades', items=len(changed_courses)):
+        formatted_grades = rows_as_dicts(format_grades_batch(grade_df, changed_courses, semesters, grade_file_name))
+    with instrumentation.stage('format_evaluations', items=len(changed_courses)):
+        formatted_evals = rows_as_dicts(format_evaluations_batch(eval_df, changed_courses, semesters, eval_file_name))
+
+    # Merge data dicts, one course at a time
+    course_name_dct = dict(zip(course_numbers, course_names))
+    for i in range (0, len(changed_courses)):
+        course = changed_courses[i]
+        formatted_grades_dct = formatted_grades[course]
+        formatted_evals_dct = formatted_evals[course]
+        with instrumentation.item('format_info'):
+            formatted_info_dct = format_info(scraped_info[course], course, info_file_name)
+
+        data_dct = {COURSE: str(course), NAME: str(course_name_dct[course]), **formatted_grades_dct, **formatted_evals_dct, **formatted_info_dct}
+        format_cache.set_data_dct(course, fingerprints[course], data_dct)
 
         # Display progress to user
-        Utils.display_progress(i, course_numbers, name_and_path_of_csv, 50)
+        Utils.display_progress(i, changed_courses, FileNameConsts.name_of_csv, 50)
+    format_cache.save(course_numbers)
+
+    # Courses without a certain key get a null value in that column
+    data_dcts = [format_cache.get_data_dct(course) for course in course_numbers]
+    column_names = {COURSE: None, NAME: None}
+    for data_dct in data_dcts:
+        column_names.update(dict.fromkeys(data_dct))
+    row_builder = DfRowBuilder(list(column_names))
+    for data_dct in data_dcts:
+        row_builder.add_dict(data_dct)
+    return row_builder.to_df(), changed_courses, removed_courses
+
+
+@instrumentation.timed('save_course_df')
+def save_course_df(course_df, course_numbers, name_and_path_of_csv, name_and_path_of_pkl, premade_columns):
+    """ Save a projection of course_df (see create_course_df) as csv, pickle and jsons.
+        premade_columns decides the columns, or if premade_columns == [], all columns of course_df are used """
+
+    # Create list with column names, this will be the data frame columns
+    if premade_columns == []:
+        column_names = list(course_df.columns)
+    else:
+        column_names = [COURSE] + [NAME] + premade_columns
+
+    # Columns that no course has are filled with null values
+    df_columns = {}
+    for column_name in column_names:
+        if column_name in course_df:
+            df_columns[column_name] = course_df[column_name]
+        else:
+            df_columns[column_name] = pd.Series([Config.data_null_value] * len(course_df), dtype=object)
+    df = pd.DataFrame(data = df_columns)
 
     # Set course ID as df index
     print("Success! Setting course ID as df index...")
-    df = df.copy() # df is copied to 'fix fragmentation', which prevents a pandas PerformanceWarning
     df.set_index(COURSE, inplace=True, drop=False)
     print(df)
 
@@ -102,6 +185,10 @@ def csv_creator(course_numbers, course_names, name_and_path_of_csv, name_and_pat
     read_csv_to_pickle(name_and_path_of_csv, name_and_path_of_pkl)
     if premade_columns != []:
         write_csv_columns_to_json(name_and_path_of_csv)
+        # Ready to render course page records, in a memory-mapped table shared by the website's workers
+        CourseTable.save(create_course_records(pd.read_pickle(name_and_path_of_pkl)))
+        print("Course table has been saved...")
+        search_index_to_json()
     else:
         print()
         filter_dct_to_json()
@@ -128,6 +215,7 @@ def read_csv_to_pickle(name_and_path_of_csv, name_and_path_of_pkl):
 
 
 
+@instrumentation.timed('write_csv_columns_to_json')
 def write_csv_columns_to_json(name_and_path_of_csv):
     """Turn csv columns into dictionary files stored as jsons"""
     # This jsons are the database that gets accessed whenever the "discovery" page (home page) is loaded.
@@ -233,12 +321,15 @@ def write_csv_columns_to_json(name_and_path_of_csv):
         dct_data = rename_dct_value(dct, column)
         sorted_dct = dict(sorted(dct_data.items(), key=lambda item: turn_to_float(item[1]))) # Be careful, this line will do absolutely nothing WITHOUT RAISING A WARNING if dct_data contains a mix of strings and numbers
         path_and_file_name = FileNameConsts.path_of_pkl + json_name + '.json'
-        with open(path_and_file_name, 'w') as fp:
-            json.dump(sorted_dct, fp)
-        print(f"The dictionary {json_name}.json has been saved...")
+        if Utils.save_json_if_changed(path_and_file_name, sorted_dct):
+            print(f"The dictionary {json_name}.json has been saved...")
+        else:
+            print(f"The dictionary {json_name}.json is unchanged...")
+        sorted_dcts[json_name] = sorted_dct
 
 
     # Load in data frame from csv
+    sorted_dcts = {}
     df = pd.read_csv(name_and_path_of_csv)
 
     # Save course json before setting course column as df index
@@ -268,64 +359,86 @@ def write_csv_columns_to_json(name_and_path_of_csv):
     save_dct_as_json(df, EvalConsts.motivation_average_score, WebsiteConsts.json_course_eval_motivation)
     save_dct_as_json(df, EvalConsts.feedback_average_score, WebsiteConsts.json_course_eval_feedback)
 
+    # Rank arrays used by the website to sort courses by each of the jsons
+    save_sort_ranks_as_json(sorted_dcts)
+
+
+def save_sort_ranks_as_json(sorted_dcts):
+    """ Save the rank of each course in every sort category, both ascending and descending, as json.
+        The ranks are lists in the order of the course numbers json (rank -1 if a course is missing from a category),
+        so the website can sort any selection of courses by their ranks """
+
+    # The course numbers json is {index: course}, the others are {course: value}
+    courses = list(sorted_dcts[WebsiteConsts.json_number].values())
+    ordinals = {courses[i]: i for i in range (0, len(courses))}
+    ranks = {}
+    for json_name in WebsiteConsts.json_as_sort_catagory:
+        if json_name == WebsiteConsts.json_number:
+            sort_order = courses
+        else:
+            sort_order = [course for course in sorted_dcts[json_name] if course in ordinals]
+        ascending = [-1] * len(courses)
+        descending = [-1] * len(courses)
+        for rank in range (0, len(sort_order)):
+            ascending[ordinals[sort_order[rank]]] = rank
+            descending[ordinals[sort_order[rank]]] = len(sort_order) - 1 - rank
+        ranks[json_name] = {WebsiteConsts.ascending: ascending, WebsiteConsts.descending: descending}
+
+    json_name = WebsiteConsts.json_sort_ranks
+    path_and_file_name = FileNameConsts.path_of_pkl + json_name + '.json'
+    if Utils.save_json_if_changed(path_and_file_name, {WebsiteConsts.json_number: courses, WebsiteConsts.json_sort_ranks: ranks}):
+        print(f"The dictionary {json_name}.json has been saved...")
+    else:
+        print(f"The dictionary {json_name}.json is unchanged...")
+
+
+@instrumentation.timed('csv_creator')
+def create_csv_files(course_numbers, course_names, incremental=False):
+    """ Create and save the csv, pickle and json files used by the website, for all courses.
+        If incremental is True, only courses whose scraped data changed since the last build are formatted """
+
+    # Csv and pickle files
+    name_and_path_of_csv = FileNameConsts.path_of_csv + FileNameConsts.name_of_csv + ".csv"
+    name_and_path_of_pkl = FileNameConsts.path_of_pkl + FileNameConsts.name_of_pkl + ".pkl"
+    path_name_extended_csv = FileNameConsts.path_of_csv + FileNameConsts.extended_csv_name + ".csv"
+    path_name_extended_pkl = FileNameConsts.path_of_pkl + FileNameConsts.extended_pkl_name + ".pkl"
+
+    # Every file the website is served from, the build can only be skipped if all of them exist
+    published_files = [name_and_path_of_csv, name_and_path_of_pkl, path_name_extended_csv, path_name_extended_pkl,
+                       FileNameConsts.path_of_pkl + FileNameConsts.course_table_name + ".bin"]
+    for json_name in list(WebsiteConsts.json_as_sort_catagory) + [WebsiteConsts.json_filter_dct, WebsiteConsts.json_sort_ranks, WebsiteConsts.json_search_index]:
+        published_files.append(FileNameConsts.path_of_pkl + json_name + '.json')
+
+    # Format all courses once (or only the changed courses), both csv files are made from the same wide df
+    course_df, changed_courses, removed_courses = create_course_df(course_numbers, course_names, incremental=incremental)
+    if incremental and changed_courses == [] and removed_courses == [] and all(os.path.exists(file_location) for file_location in published_files):
+        print("No courses have changed since the last build, the csv files are up to date.")
+    else:
+        print("Creating csv file: "+name_and_path_of_csv)
+        print()
+        save_course_df(course_df, course_numbers, name_and_path_of_csv, name_and_path_of_pkl, PREMADE_COLUMNS)
+
+        # Create extended csv
+        print("Creating extended csv file: "+path_name_extended_csv)
+        print()
+        save_course_df(course_df, course_numbers, path_name_extended_csv, path_name_extended_pkl, [])
+
 
 #%%
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create the csv, pickle and json files used by the website')
+    parser.add_argument('--incremental', action='store_true', help='only format the courses whose scraped data changed since the last build')
+    args = parser.parse_args()
+
     # Variables and initialization
     COURSE_NUMBERS = Utils.get_course_numbers()
     COURSE_NAMES = Utils.get_course_names()
     #COURSE_NUMBERS = ['02402']
 
-    # Define columns in the smaller of the two CSV-files
-    BASIC_COLUMNS = [InfoConsts.danish_name.key_df, InfoConsts.language.key_df, InfoConsts.ects_points.key_df, InfoConsts.course_type.key_df,
-                     GradeConsts.students_per_semester, InfoConsts.semester_period.key_df, InfoConsts.exam_type.key_df,
-                     InfoConsts.assignments.key_df, InfoConsts.time_of_week.key_df, InfoConsts.last_updated.key_df]
-
-    GRADE_COLUMNS = [GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4, GradeConsts.grade_02,
-                     GradeConsts.grade_00, GradeConsts.grade_minus_3, GradeConsts.grade_passed, GradeConsts.grade_failed,
-                     GradeConsts.grade_absent, GradeConsts.grade_average, GradeConsts.students_total, GradeConsts.percent_passed,
-                     GradeConsts.percent_failed, GradeConsts.percent_absent]
-
-    EVAL_COLUMNS = [EvalConsts.rating_tier, EvalConsts.rating_average_score, EvalConsts.rating_votes,
-                    EvalConsts.learning_tier, EvalConsts.learning_average_score, EvalConsts.learning_votes,
-                    EvalConsts.motivation_tier, EvalConsts.motivation_average_score, EvalConsts.motivation_votes,
-                    EvalConsts.feedback_tier, EvalConsts.feedback_average_score, EvalConsts.feedback_votes,
-                    EvalConsts.workload_tier, EvalConsts.workload_average_score, EvalConsts.workload_votes, EvalConsts.workload_4_star, EvalConsts.workload_5_star]
-
-    RESPONSIBLE_COLUMNS =  [InfoConsts.main_responsible_name.key_df, InfoConsts.main_responsible_pic.key_df,
-                            InfoConsts.co_responsible_1_name.key_df, InfoConsts.co_responsible_1_pic.key_df,
-                            InfoConsts.co_responsible_2_name.key_df, InfoConsts.co_responsible_2_pic.key_df,
-                            InfoConsts.co_responsible_3_name.key_df, InfoConsts.co_responsible_3_pic.key_df,
-                            InfoConsts.co_responsible_4_name.key_df, InfoConsts.co_responsible_4_pic.key_df]
-
-    CONTENT_COLUMNS =  [InfoConsts.course_description.key_df, InfoConsts.scope_and_form.key_df, (InfoConsts.exam_type.key_df)+'_'+InfoConsts.raw_key,
-                        (InfoConsts.exam_aid.key_df)+'_'+InfoConsts.raw_key, (InfoConsts.location.key_df)+'_'+InfoConsts.raw_key, InfoConsts.time_of_week_updated.key_df,
-                        InfoConsts.exam_duration.key_df, InfoConsts.home_page.key_df, InfoConsts.learning_objectives.key_df, InfoConsts.course_content.key_df, InfoConsts.remarks.key_df,
-                        InfoConsts.recommended_prerequisites.key_df, InfoConsts.mandatory_prerequisites.key_df, InfoConsts.study_lines.key_df, GradeConsts.semesters_total, InfoConsts.institute.key_df]
-
-    SEMESTER_ELEMENTS = [GradeConsts.students_total, GradeConsts.grade_average, GradeConsts.percent_failed,
-                         GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4, GradeConsts.grade_02, GradeConsts.grade_00, GradeConsts.grade_minus_3,
-                         EvalConsts.learning_votes, EvalConsts.workload_average_score, EvalConsts.learning_average_score,
-                         EvalConsts.motivation_average_score, EvalConsts.feedback_average_score]
-
-    SEMESTER_COLUMNS = Utils.generate_columns(Config.course_semesters, SEMESTER_ELEMENTS, add_index = False)
-
-    # Create CSV file
-    PREMADE_COLUMNS = BASIC_COLUMNS + GRADE_COLUMNS + EVAL_COLUMNS + RESPONSIBLE_COLUMNS + CONTENT_COLUMNS + SEMESTER_COLUMNS # If adding a new column_name, be sure to add it to format info script as well!
-    name_and_path_of_csv = FileNameConsts.path_of_csv + FileNameConsts.name_of_csv + ".csv"
-    name_and_path_of_pkl = FileNameConsts.path_of_pkl + FileNameConsts.name_of_pkl + ".pkl"
-    print("Creating csv file: "+name_and_path_of_csv)
-    print()
-    csv_creator(COURSE_NUMBERS, COURSE_NAMES, name_and_path_of_csv, name_and_path_of_pkl, PREMADE_COLUMNS)
-
-    # Create extended csv
-    PREMADE_COLUMNS = []
-    path_name_extended_csv = FileNameConsts.path_of_csv + FileNameConsts.extended_csv_name + ".csv"
-    path_name_extended_pkl = FileNameConsts.path_of_pkl + FileNameConsts.extended_pkl_name + ".pkl"
-    csv_creator(COURSE_NUMBERS, COURSE_NAMES, path_name_extended_csv, path_name_extended_pkl, PREMADE_COLUMNS)
-    print("Creating extended csv file: "+path_name_extended_csv)
-    print()
+    # Create the csv, pickle and json files
+    create_csv_files(COURSE_NUMBERS, COURSE_NAMES, incremental=args.incremental)
 
     # Success!
+    instrumentation.save_report('csv_creator')
     print("Success! Program will now terminate.")
 
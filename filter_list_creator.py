@@ -4,6 +4,7 @@
 import json
 import pandas as pd
 # Helper functions and global constants
+from instrumentation import instrumentation
 from utils import Utils
 from website.global_constants.file_name_consts import FileNameConsts
 from website.global_constants.info_consts import InfoConsts
@@ -74,6 +75,7 @@ def filter_dct_creator():
 
     return filter_dct
 
+@instrumentation.timed('filter_dct_to_json')
 def filter_dct_to_json():
     """ Create and save dct used for website filter functionality """
     filter_dct = filter_dct_creator()
@@ -81,9 +83,10 @@ def filter_dct_to_json():
     # save as JSON
     json_name  = WebsiteConsts.json_filter_dct
     path_and_file_name = FileNameConsts.path_of_pkl + json_name + '.json'
-    with open(path_and_file_name, 'w') as fp:
-        json.dump(filter_dct, fp)
-    print(f"The dictionary {json_name}.json has been saved...")
+    if Utils.save_json_if_changed(path_and_file_name, filter_dct):
+        print(f"The dictionary {json_name}.json has been saved...")
+    else:
+        print(f"The dictionary {json_name}.json is unchanged...")
 
     """
     # Language lists
@@ -0,0 +1,104 @@
+#%%
+
+# Imports
+import glob
+import hashlib
+import json
+import os
+import pickle
+# Helper functions and global constants
+from utils import Utils
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class FormatCache:
+    """ Formatted data dict of each course, stored with a fingerprint of the scraped data it was formatted from.
+        A course only has to be formatted again if its fingerprint changed since the last build.
+        The whole cache is discarded if the formatting code or the format settings have changed """
+
+    # Changes to these files (or to the format settings in Config) can change any formatted course.
+    # They are found relative to this file, so the build can be run from any folder
+    FORMAT_SOURCES = ['format_*.py', 'website/global_constants/*.py']
+    SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, file_name=FileNameConsts.format_cache_name, incremental=True):
+        folder_name = FileNameConsts.scraped_data_folder_name
+        Utils.create_folder(folder_name)
+        self.file_location = f'{folder_name}/{file_name}.pkl'
+        self.build_fingerprint = self._build_fingerprint()
+        self.fingerprints = {}
+        self.data_dcts = {}
+        if incremental:
+            self._load()
+
+
+    def __len__(self):
+        return len(self.data_dcts)
+
+
+    def is_current(self, course, fingerprint):
+        """Return True if course has been formatted from scraped data with this fingerprint"""
+        return self.fingerprints.get(course) == fingerprint
+
+
+    def get_data_dct(self, course):
+        return self.data_dcts[course]
+
+
+    def set_data_dct(self, course, fingerprint, data_dct):
+        self.fingerprints[course] = fingerprint
+        self.data_dcts[course] = data_dct
+
+
+    def save(self, course_numbers):
+        """Save the cache for course_numbers (courses that are no longer in course_numbers are dropped)"""
+        cache = {'build_fingerprint': self.build_fingerprint,
+                 'fingerprints': {course: self.fingerprints[course] for course in course_numbers},
+                 'data_dcts': {course: self.data_dcts[course] for course in course_numbers}}
+        tmp_location = f'{self.file_location}.tmp'
+        with open(tmp_location, 'wb') as f:
+            pickle.dump(cache, f)
+        os.replace(tmp_location, self.file_location)
+
+
+    @staticmethod
+    def fingerprint(*scraped_rows):
+        """Return a fingerprint of the scraped rows (and any other values) that a course is formatted from"""
+        serialized = json.dumps(scraped_rows, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+    def _build_fingerprint(self):
+        """Return a fingerprint of the formatting code and settings"""
+        sha = hashlib.sha256()
+        for pattern in self.FORMAT_SOURCES:
+            file_locations = sorted(glob.glob(os.path.join(self.SOURCE_FOLDER, pattern)))
+            # Without the formatting code, code changes would never discard the cache
+            if file_locations == []:
+                raise FileNotFoundError(f"Format cache: No formatting code matches {pattern} in {self.SOURCE_FOLDER}")
+            for file_location in file_locations:
+                with open(file_location, 'rb') as f:
+                    sha.update(f.read())
+        settings = [Config.course_semesters, Config.data_null_value, Config.data_decimal_precision, Config.data_percental_precision]
+        sha.update(json.dumps(settings).encode('utf-8'))
+        return sha.hexdigest()
+
+
+    def _load(self):
+        """Load the cache of the previous build, unless it was made with other formatting code or settings"""
+        if not os.path.exists(self.file_location):
+            return
+        try:
+            with open(self.file_location, 'rb') as f:
+                cache = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) as error:
+            message = f"Format cache: Could not read {self.file_location}, all courses will be formatted ({error})"
+            Utils.logger(message, 'warning', FileNameConsts.format_log_name)
+            return
+        if cache['build_fingerprint'] != self.build_fingerprint:
+            message = "Format cache: Formatting code or settings have changed, all courses will be formatted"
+            Utils.logger(message, 'info', FileNameConsts.format_log_name)
+            return
+        self.fingerprints = cache['fingerprints']
+        self.data_dcts = cache['data_dcts']
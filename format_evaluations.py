@@ -1,6 +1,8 @@
 #%%
 
 # Imports
+import numpy as np
+import pandas as pd
 # Helper functions and global constants
 from utils import Utils
 from website.global_constants.config import Config
@@ -162,6 +164,98 @@ def format_evaluations(scraped_evals, course_number, course_semesters, file_name
     return evaluations
 
 
+def format_evaluations_batch(eval_df, course_numbers, course_semesters, file_name):
+    """ Return formatted evaluations and statistics for all courses at once, as a df with one row per course.
+        The scraped evaluations are reshaped into a (course x semester x question x score) array, so every statistic
+        is computed for all courses in one pass. Each row is identical to format_evaluations() for that course """
+
+    # Initialization
+    WORKLOAD = EvalConsts.workload
+    LEARNING = EvalConsts.learning
+    MOTIVATION = EvalConsts.motivation
+    FEEDBACK = EvalConsts.feedback
+    RATING = EvalConsts.rating
+    SCORES = [EvalConsts.score_1, EvalConsts.score_2, EvalConsts.score_3, EvalConsts.score_4, EvalConsts.score_5]
+    STAR = EvalConsts.star
+    VOTES = EvalConsts.votes
+    AVERAGE_SCORE = EvalConsts.average_score
+    UPVOTE_RATIO = EvalConsts.upvote_ratio
+    TIER = EvalConsts.tier
+    NO_EVALUATIONS = EvalConsts.no_evaluations
+    EVAL_TYPES = [WORKLOAD, LEARNING, MOTIVATION, FEEDBACK, RATING]
+    SCORE_WEIGHT = np.arange(1, len(SCORES)+1)
+    # Lower bounds of tier 2-9, see decide_group() in format_evaluations()
+    TIER_BOUNDS = np.array([1.25, 1.75, 2.25, 2.75, 3.25, 3.75, 4.25, 4.75])
+
+    def load_score_counts():
+        """Reshape the scraped evaluations into an integer array of shape (course, semester, eval type, score)"""
+        score_counts = np.zeros((len(course_numbers), len(course_semesters), len(EVAL_TYPES), len(SCORES)), dtype=np.int64)
+        rows = eval_df.loc[course_numbers]
+        no_scores = [0] * len(SCORES)
+        for i in range (0, len(course_semesters)):
+            for j in range (0, len(EVAL_TYPES)):
+                key = course_semesters[i]+'_'+EVAL_TYPES[j]
+                if EVAL_TYPES[j] != RATING and key in rows:
+                    # Missing evaluations are None (or NaN) and count as 0 votes
+                    values = [no_scores if (value is None or isinstance(value, float)) else value for value in rows[key].tolist()]
+                    score_counts[:, i, j, :] = np.array(values, dtype=np.int64).reshape(len(course_numbers), len(SCORES))
+        # RATING is the sum of all evaluations except WORKLOAD
+        rating_types = [EVAL_TYPES.index(eval_type) for eval_type in EVAL_TYPES if eval_type not in [WORKLOAD, RATING]]
+        score_counts[:, :, EVAL_TYPES.index(RATING), :] = score_counts[:, :, rating_types, :].sum(axis=2)
+        return score_counts
+
+    def find_statistics(score_counts):
+        """ Return votes, average scores, upvote ratios and tiers for score_counts of shape (..., eval type, score).
+            Averages and upvote ratios are lists of python floats (or NO_EVALUATIONS) with the same shape """
+        votes = score_counts.sum(axis=-1)
+        has_votes = votes != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = (score_counts * SCORE_WEIGHT).sum(axis=-1) / votes
+            upvote_ratios = (score_counts[..., 3] + score_counts[..., 4]) / votes
+
+        # For workload, the deviation from center value 3 is exaggerated (up to a factor 2), see format_evaluations()
+        workload = averages[..., EVAL_TYPES.index(WORKLOAD)]
+        deviation_factor = 2 - (np.abs((workload - 3) / 2))
+        averages[..., EVAL_TYPES.index(WORKLOAD)] = 3 + ((workload - 3) * deviation_factor)
+
+        # Round with python's round(), which is not always equal to np.round()
+        rounded_averages = np.array([round(value, Config.data_decimal_precision) for value in averages.ravel().tolist()]).reshape(averages.shape)
+        rounded_upvote_ratios = np.array([round(value, 1) for value in upvote_ratios.ravel().tolist()]).reshape(upvote_ratios.shape)
+
+        # Tiers between 1 and 9 based on the rounded average, tier 0 if there are no evaluations
+        tiers = np.where(has_votes, np.searchsorted(TIER_BOUNDS, np.where(has_votes, rounded_averages, 0), side='right') + 1, 0)
+        averages = np.where(has_votes, rounded_averages.astype(object), NO_EVALUATIONS)
+        upvote_ratios = np.where(has_votes, rounded_upvote_ratios.astype(object), NO_EVALUATIONS)
+        return votes, averages, upvote_ratios, tiers
+
+    def create_columns(score_counts, prefix, columns):
+        """Add statistics and raw data for each eval type (for a single semester or all semesters) to columns"""
+        votes, averages, upvote_ratios, tiers = find_statistics(score_counts)
+        for j in range (0, len(EVAL_TYPES)):
+            semester_and_q = prefix+EVAL_TYPES[j]+'_'
+            columns[semester_and_q+VOTES] = votes[:, j].tolist()
+            columns[semester_and_q+AVERAGE_SCORE] = averages[:, j].tolist()
+            columns[semester_and_q+UPVOTE_RATIO] = upvote_ratios[:, j].tolist()
+            columns[semester_and_q+TIER] = tiers[:, j].tolist()
+            for k in range (0, len(SCORES)):
+                columns[semester_and_q+SCORES[k]+'_'+STAR] = score_counts[:, j, k].tolist()
+
+
+#%%
+    score_counts = load_score_counts()
+
+    # Statistics and raw data for the entire course, followed by each semester
+    columns = {}
+    create_columns(score_counts.sum(axis=1), '', columns)
+    for i in range (0, len(course_semesters)):
+        create_columns(score_counts[:, i], course_semesters[i]+'_', columns)
+
+    # Object columns keep the python types ("No data" and floats in the same column)
+    df = pd.DataFrame(data = columns, index = course_numbers, dtype = object)
+    Utils.logger(f"{file_name}: Formatted evaluations for {len(course_numbers)} courses", 'log', FileNameConsts.format_log_name)
+    return df
+
+
 #%%
 
 if __name__ == "__main__":
@@ -170,20 +264,13 @@ if __name__ == "__main__":
     COURSE_NUMBERS = ['01005', '02105']
 
 
-    # Main loop
-    iteration_count = 0
-    for course in COURSE_NUMBERS:
-        df_location = FileNameConsts.eval_df
-        df = Utils.load_scraped_df(df_location)
-
-        scraped_evals = df.loc[course].to_dict()
-        semesters = Config.course_semesters
-        file_name = FileNameConsts.eval_format
-        formatted_evals = format_evaluations(scraped_evals, course, semesters, file_name)
+    # Format all courses in one batch
+    df_location = FileNameConsts.eval_df
+    df = Utils.load_scraped_df(df_location)
+    semesters = Config.course_semesters
+    file_name = FileNameConsts.eval_format
+    formatted_evals = format_evaluations_batch(df, COURSE_NUMBERS, semesters, file_name)
 
-        # print formatted evals
-        print(formatted_evals)
-
-        # Display progress to user
-        Utils.display_progress(iteration_count, COURSE_NUMBERS, FileNameConsts.eval_format, 200)
-        iteration_count += 1 # iteration_count must be incremented AFTER display progress
+    # print formatted evals
+    for course in COURSE_NUMBERS:
+        print(formatted_evals.loc[course].to_dict())
@@ -1,6 +1,8 @@
 #%%
 
 # Imports
+import numpy as np
+import pandas as pd
 # Helper functions and global constants
 from utils import Utils
 from website.global_constants.config import Config
@@ -179,6 +181,140 @@ def format_grades(scraped_grades, course_number, course_semesters, file_name):
     return grades
 
 
+def format_grades_batch(grade_df, course_numbers, course_semesters, file_name):
+    """ Return formatted grades and statistics for all courses at once, as a df with one row per course.
+        The scraped grades are reshaped into a (course x semester x grade) array, so every statistic is
+        computed for all courses in one pass. Each row is identical to format_grades() for that course """
+
+    # Initialization
+    GRADES = GradeConsts.list_of_grades
+    NUMERIC_GRADES = [GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4,
+                      GradeConsts.grade_02, GradeConsts.grade_00, GradeConsts.grade_minus_3]
+    GRADE_WEIGHT = np.array([12, 10, 7, 4, 2, 0, -3])
+    PASSED_GRADES = [GradeConsts.grade_12, GradeConsts.grade_10, GradeConsts.grade_7, GradeConsts.grade_4, GradeConsts.grade_02, GradeConsts.grade_passed]
+    FAILED_GRADES = [GradeConsts.grade_00, GradeConsts.grade_minus_3, GradeConsts.grade_failed]
+    ABSENT_GRADES = [GradeConsts.grade_absent]
+    NO_GRADES = GradeConsts.grade_none
+    PASS_FAIL = GradeConsts.pass_fail
+
+    def grade_indexes(grades):
+        return [GRADES.index(grade) for grade in grades]
+
+    def load_grade_counts():
+        """Reshape the scraped grades into an integer array of shape (course, semester, grade)"""
+        grade_counts = np.zeros((len(course_numbers), len(course_semesters), len(GRADES)), dtype=np.int64)
+        rows = grade_df.loc[course_numbers]
+        for j in range (0, len(course_semesters)):
+            for k in range (0, len(GRADES)):
+                key = course_semesters[j]+'_'+GRADES[k]
+                if key in rows:
+                    # Null values count as 0 students, and counts are truncated like int() would do
+                    values = pd.to_numeric(rows[key], errors='coerce').to_numpy(dtype=float, na_value=0)
+                    grade_counts[:, j, k] = np.trunc(values)
+        return grade_counts
+
+    def round_each(values, decimals):
+        """Round with python's round(), which is not always equal to np.round()"""
+        return [round(value, decimals) for value in values.tolist()]
+
+    def find_grade_average(grade_count):
+        """Calculate average grades, or NO_GRADES / PASS_FAIL. grade_count has shape (..., grade)"""
+        numeric_counts = grade_count[..., grade_indexes(NUMERIC_GRADES)]
+        grade_weighted = (numeric_counts * GRADE_WEIGHT).sum(axis=-1)
+        numeric_grade_count = numeric_counts.sum(axis=-1)
+        any_grade_count = grade_count.sum(axis=-1)
+        pass_fail_count = grade_count[..., grade_indexes([GradeConsts.grade_passed, GradeConsts.grade_failed])].sum(axis=-1)
+
+        # Don't divide by 0 or find average on PASSED/FAILED course type
+        # Note that some PASSED/FAILED courses might contain up to 10% numeric grades (happens due to DTU rules)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = round_each(grade_weighted / numeric_grade_count, Config.data_decimal_precision)
+        is_empty = (any_grade_count == 0).tolist()
+        is_pass_fail = (numeric_grade_count * 10 <= pass_fail_count).tolist()
+        for i in range (0, len(averages)):
+            if is_empty[i]:
+                averages[i] = NO_GRADES
+            elif is_pass_fail[i]:
+                averages[i] = PASS_FAIL
+        return averages
+
+    def exam_percentages(grade_count):
+        """Return percentages of students that passed / failed / were absent. grade_count has shape (..., grade)"""
+        counts = [grade_count[..., grade_indexes(grades)].sum(axis=-1) for grades in [PASSED_GRADES, FAILED_GRADES, ABSENT_GRADES]]
+        total_count = counts[0] + counts[1] + counts[2]
+        is_empty = (total_count == 0).tolist()
+        percentages = []
+        for count in counts:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                percentage = round_each(100 * (count / total_count), Config.data_percental_precision)
+            # Avoid division by 0 if course has no exam
+            percentages.append([NO_GRADES if is_empty[i] else percentage[i] for i in range(0, len(percentage))])
+        return percentages
+
+    def create_statistics_columns(grade_count, prefix, columns):
+        """Add total students, average grade and exam percentages (for a single semester or all semesters) to columns"""
+        passed, failed, absent = exam_percentages(grade_count)
+        columns[prefix+GradeConsts.students_total] = grade_count.sum(axis=-1).tolist()
+        columns[prefix+GradeConsts.grade_average] = find_grade_average(grade_count)
+        columns[prefix+GradeConsts.percent_passed] = passed
+        columns[prefix+GradeConsts.percent_failed] = failed
+        columns[prefix+GradeConsts.percent_absent] = absent
+
+    def number_of_semesters(students, percent_passed):
+        """ Get number of semesters and average enrolled students, see format_grades(). Some exam periods might be re-exam only,
+            and should not count as a semester. The sums run over the semester axis one semester at a time, so floats add up
+            in the same order as in format_grades() """
+        has_students = students != 0
+        not_passed = np.where(has_students, 1 - (percent_passed / 100), 0.0)
+        semester_count = has_students.sum(axis=1)
+        students_sum = np.zeros(len(students), dtype=np.int64)
+        not_passed_sum = np.zeros(len(students))
+        for j in range (0, students.shape[1]):
+            students_sum += students[:, j]
+            not_passed_sum += not_passed[:, j]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_students = students_sum / semester_count
+            avg_not_passed = not_passed_sum / semester_count
+            is_real_semester = has_students & (students > (avg_students*(0.05 + avg_not_passed)*1.5)[:, np.newaxis])
+            real_semesters = is_real_semester.sum(axis=1)
+            enrolled = np.rint(np.where(is_real_semester, students, 0).sum(axis=1) / real_semesters)
+        # Courses without students (or without any real semester) have 0 enrolled students
+        enrolled = np.where(real_semesters == 0, 0, enrolled).astype(np.int64)
+        return enrolled.tolist(), real_semesters.tolist()
+
+
+#%%
+    grade_counts = load_grade_counts()
+    grade_count_all_semesters = grade_counts.sum(axis=1)
+
+    # Statistics and raw data for the entire course
+    columns = {}
+    create_statistics_columns(grade_count_all_semesters, '', columns)
+    for k in range (0, len(GRADES)):
+        columns[GRADES[k]] = grade_count_all_semesters[:, k].tolist()
+
+    # Statistics and raw data for each semester
+    semester_columns = {}
+    for j in range (0, len(course_semesters)):
+        create_statistics_columns(grade_counts[:, j, :], course_semesters[j]+'_', semester_columns)
+        for k in range (0, len(GRADES)):
+            semester_columns[course_semesters[j]+'_'+GRADES[k]] = grade_counts[:, j, k].tolist()
+
+    # Count semesters based on the (rounded) percentage of students that passed each semester
+    students = grade_counts.sum(axis=2)
+    percent_passed = np.array([[0 if value == NO_GRADES else value for value in semester_columns[semester+'_'+GradeConsts.percent_passed]]
+                               for semester in course_semesters], dtype=float).T.reshape(students.shape)
+    enrolled, semesters = number_of_semesters(students, percent_passed)
+    columns[GradeConsts.students_per_semester] = enrolled
+    columns[GradeConsts.semesters_total] = semesters
+
+    # Object columns keep the python types (0 stays an int, averages stay floats)
+    columns = {**columns, **semester_columns}
+    df = pd.DataFrame(data = columns, index = course_numbers, dtype = object)
+    Utils.logger(f"{file_name}: Formatted grades for {len(course_numbers)} courses", 'log', FileNameConsts.format_log_name)
+    return df
+
+
 #%%
 if __name__ == "__main__":
     # Variables and initialization'
@@ -186,20 +322,13 @@ if __name__ == "__main__":
     COURSE_NUMBERS = ['01005', '01017']
 
 
-    # Main loop
-    iteration_count = 0
-    for course in COURSE_NUMBERS:
-        df_location = FileNameConsts.grade_df
-        df = Utils.load_scraped_df(df_location)
-
-        scraped_grades = df.loc[course].to_dict()
-        semesters = Config.course_semesters
-        file_name = FileNameConsts.grade_format
-        formatted_grades = format_grades(scraped_grades, course, semesters, file_name)
+    # Format all courses in one batch
+    df_location = FileNameConsts.grade_df
+    df = Utils.load_scraped_df(df_location)
+    semesters = Config.course_semesters
+    file_name = FileNameConsts.grade_format
+    formatted_grades = format_grades_batch(df, COURSE_NUMBERS, semesters, file_name)
 
-        # print formatted grades
-        print(formatted_grades)
-
-        # Display progress to user
-        Utils.display_progress(iteration_count, COURSE_NUMBERS, FileNameConsts.grade_format, 200)
-        iteration_count += 1 # iteration_count must be incremented AFTER display progress
+    # print formatted grades
+    for course in COURSE_NUMBERS:
+        print(formatted_grades.loc[course].to_dict())
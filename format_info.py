@@ -141,7 +141,7 @@ def format_info(scraped_info, course_number, info_name):
             # Print a warning if an element in the scraped study line list was not recognized
             if key_renamed == InfoConsts.study_lines.key_df and len(lst_of_study_lines) != boolean_value_count:
                 message = f"{info_name}, {course_number}: {len(lst_of_study_lines) - boolean_value_count} unknown study line(s)"
-                Utils.logger(message, "warning", FileNameConsts.format_log_name)
+                Utils.logger(message, "warning", FileNameConsts.format_log_name, course=course_number, stage=info_name)
                 for k in range(0, len(lst_of_study_lines)):
                     if lst_of_study_lines[k] not in values:
                         print(f'Warning, {course_number}: "{lst_of_study_lines[k]}" was not recognized as a study line. Go to line ~630 and manually update list')
@@ -163,7 +163,7 @@ def format_info(scraped_info, course_number, info_name):
                 else:
                     lst_of_booleans.append(InfoConsts.unknown_value)
                 message = f"{info_name}, {course_number}: {key_renamed}'s boolean sum is 0"
-                Utils.logger(message, log_type, FileNameConsts.format_log_name)
+                Utils.logger(message, log_type, FileNameConsts.format_log_name, course=course_number, stage=info_name)
 
         # Institute is decided based on course number rather than scraped data
         elif key_renamed == InfoConsts.institute.key_df:
@@ -179,7 +179,7 @@ def format_info(scraped_info, course_number, info_name):
         # If key was not found in scraped_info_dict:
         else:
             message = f"{info_name}, {course_number}: {key_renamed} not found in info_scrape"
-            Utils.logger(message, log_type, FileNameConsts.format_log_name)
+            Utils.logger(message, log_type, FileNameConsts.format_log_name, course=course_number, stage=info_name)
 
         # Combine lst_of_booleans into string
         if len(lst_of_booleans) > 0:
@@ -218,7 +218,7 @@ def format_info(scraped_info, course_number, info_name):
         else:
             department = "Partner University"
             message = f"{info_name}, {course_number}: Institute {first_two_digits} is unknown"
-            Utils.logger(message, "warning", FileNameConsts.format_log_name)
+            Utils.logger(message, "warning", FileNameConsts.format_log_name, course=course_number, stage=info_name)
         return department
 
 
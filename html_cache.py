@@ -0,0 +1,87 @@
+#%%
+
+# Imports
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+# Helper functions and global constants
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class HtmlCache:
+    """ Disk-backed cache of raw page sources. Each url is stored in its own gzip-compressed
+        json file, named after the sha256 hash of the url. An entry holds the page source, the
+        status code, the time it was fetched, and the ETag / Last-Modified headers that are
+        needed to revalidate it once its data source's TTL has expired """
+
+    def __init__(self, folder_name=FileNameConsts.scraped_data_folder_name+'/'+FileNameConsts.html_cache_folder_name):
+        self.folder_name = folder_name
+
+
+    def load(self, url):
+        """Return the cache entry for url, or None if url has not been cached"""
+        file_location = self._file_location(url)
+        try:
+            with gzip.open(file_location, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+
+
+    def store(self, url, page_source, status_code=200, etag=None, last_modified=None):
+        """Save page_source as the cache entry for url and return the entry"""
+        entry = {'url': url,
+                 'fetched_at': time.time(),
+                 'status_code': status_code,
+                 'etag': etag,
+                 'last_modified': last_modified,
+                 'page_source': page_source}
+        self._write(url, entry)
+        return entry
+
+
+    def touch(self, entry):
+        """Reset the fetch timestamp of an entry that the server confirmed is still valid"""
+        entry['fetched_at'] = time.time()
+        self._write(entry['url'], entry)
+
+
+    def remove(self, url):
+        """Delete the cache entry for url if it exists"""
+        try:
+            os.remove(self._file_location(url))
+        except FileNotFoundError:
+            pass
+
+
+    def is_fresh(self, entry, data_source):
+        """ Return True if entry is younger than the TTL of data_source. A TTL of None never expires.
+            Missing pages (404) use their own TTL, as they may be published later """
+        if entry['status_code'] == 200:
+            ttl_days = Config.cache_ttl_days.get(data_source, 0)
+        else:
+            ttl_days = Config.cache_ttl_days_missing
+        if ttl_days is None:
+            return True
+        return time.time() - entry['fetched_at'] < ttl_days * 24 * 60 * 60
+
+
+    def _file_location(self, url):
+        """Content address of url. Files are spread over 256 subfolders to keep folders small"""
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return f'{self.folder_name}/{url_hash[0:2]}/{url_hash}.json.gz'
+
+
+    def _write(self, url, entry):
+        """Write entry to a temporary file first, so a crash never leaves a half-written entry"""
+        file_location = self._file_location(url)
+        # Threads of the scrape pools may create the same subfolder at once
+        os.makedirs(os.path.dirname(file_location), exist_ok=True)
+        temporary_location = f'{file_location}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with gzip.open(temporary_location, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temporary_location, file_location)
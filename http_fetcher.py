@@ -0,0 +1,147 @@
+#%%
+
+# Imports
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+# Helper functions and global constants
+from html_cache import HtmlCache
+from instrumentation import instrumentation
+from rate_limiter import RateLimiter
+from utils import Utils
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class HttpFetcher:
+    """ Fetch page sources with plain HTTP requests instead of a browser. Each thread gets its own
+        requests.Session, so connections are kept alive between requests to the same host,
+        and responses are gzip-compressed in transit. Page sources are kept in an HtmlCache,
+        so pages that are still fresh are never requested twice """
+
+    def __init__(self, timeout=Config.http_timeout, requests_per_second=Config.scrape_requests_per_second, use_cache=Config.cache_enabled, verify_ssl=True):
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = None
+        if use_cache:
+            self.cache = HtmlCache()
+        self._local = threading.local()
+
+
+    def get(self, url, headers=None):
+        """Return the response from url, or None if the request failed"""
+        self.rate_limiter.wait(url)
+        try:
+            with instrumentation.item('http_request'):
+                response = self._session().get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            message = f"Http fetcher, {type(e).__name__} at url: {url}"
+            Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name)
+            return None
+        # Without a declared charset, requests would decode the html as latin-1
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            response.encoding = 'utf-8'
+        return response
+
+
+    def get_page_source(self, url, data_source=None):
+        """ Return page source from url, or an empty string if the page does not exist (404). Return None if
+            the request failed, so callers can tell a failed fetch from a missing page.
+            If data_source is given, the page is served from the cache while it is fresh """
+        if self.cache is None or data_source is None:
+            response = self.get(url)
+            if response is None:
+                return None
+            elif response.status_code == 200:
+                return response.text
+            elif response.status_code == 404:
+                return ''
+            return self._failed(url, response)
+
+        # Serve fresh pages from cache, and revalidate expired pages with a conditional request
+        entry = self.cache.load(url)
+        if entry is not None and self.cache.is_fresh(entry, data_source):
+            instrumentation.count('http_request', 'cache_hits')
+            return entry['page_source']
+        headers = {}
+        if entry is not None and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        response = self.get(url, headers)
+
+        if response is None:
+            # Network error: a stale page is better than no page
+            if entry is not None:
+                return entry['page_source']
+            return None
+        elif response.status_code == 304 and entry is not None:
+            instrumentation.count('http_request', 'not_modified')
+            self.cache.touch(entry)
+            return entry['page_source']
+        elif response.status_code == 200:
+            self.cache.store(url, response.text, 200, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return response.text
+        elif response.status_code == 404:
+            self.cache.store(url, '', 404)
+            return ''
+        return self._failed(url, response)
+
+
+    def get_validated_page_source(self, url, data_source):
+        """ Return page source from url if it contains the validation marker of data_source, and
+            it is either cached or data_source is fetched via http. Otherwise, return an empty
+            string so the caller can fall back to selenium """
+        if Config.fetch_modes.get(data_source) != 'http':
+            return self.get_cached_page_source(url, data_source)
+        page_source = self.get_page_source(url, data_source)
+        if page_source is None:
+            return ''
+        marker = Config.fetch_validation_markers.get(data_source, '')
+        if page_source != '' and marker not in page_source:
+            message = f"Http fetcher, {data_source}: Validation marker missing, falling back to selenium at url: {url}"
+            Utils.logger(message, 'log', FileNameConsts.scrape_log_name)
+            if self.cache is not None:
+                self.cache.remove(url)
+            page_source = ''
+        return page_source
+
+
+    def get_cached_page_source(self, url, data_source):
+        """ Return the cached page source from url if it is fresh and valid, without any network request.
+            Return an empty string otherwise """
+        if self.cache is None:
+            return ''
+        entry = self.cache.load(url)
+        marker = Config.fetch_validation_markers.get(data_source, '')
+        if entry is None or not self.cache.is_fresh(entry, data_source) or marker not in entry['page_source']:
+            return ''
+        return entry['page_source']
+
+
+    def store_page_source(self, url, page_source):
+        """Cache a page source that was obtained without the fetcher (i.e. rendered by selenium)"""
+        if self.cache is not None and page_source != '':
+            self.cache.store(url, page_source)
+
+
+    def _failed(self, url, response):
+        """Log a response that is neither a page nor a 404 (e.g. a server error), and return None"""
+        message = f"Http fetcher, status code {response.status_code} at url: {url}"
+        Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name)
+        return None
+
+
+    def _session(self):
+        """Return the session of the current thread, create it on first use"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            session.verify = self.verify_ssl
+            self._local.session = session
+        return session
@@ -0,0 +1,134 @@
+#%%
+
+# Imports
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+# Helper functions and global constants
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class Instrumentation:
+    """ Wall time, item counts, per-item latencies and counters of each stage of the pipeline
+        (e.g. scrape_info, format_info or write_csv_columns_to_json). Stages are measured with
+        stage() (a block of work), item() (one item, such as a course) or timed (a function call is one item).
+        A stage's wall time runs from the start of its first measurement to the end of its last, so items that
+        are measured in parallel threads are not counted twice. report() summarizes every stage, including the
+        p50/p95/p99 item latency, and save_report() saves the summary as json at the end of a run """
+
+    PERCENTILES = [50, 95, 99]
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+
+    @contextlib.contextmanager
+    def stage(self, stage_name, items=0):
+        """Measure a block of work that handles items items, e.g. a batch of courses"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(stage_name, start, time.perf_counter(), items, None)
+
+
+    @contextlib.contextmanager
+    def item(self, stage_name):
+        """Measure a single item of a stage, e.g. one course"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._record(stage_name, start, end, 1, end - start)
+
+
+    def timed(self, stage_name):
+        """Decorator that measures each call of a function as an item of stage_name"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.item(stage_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+    def count(self, stage_name, counter_name, amount=1):
+        """Add amount to a counter of stage_name, e.g. the cache hits of a fetcher"""
+        with self._lock:
+            counters = self._get_stage(stage_name)['counters']
+            counters[counter_name] = counters.get(counter_name, 0) + amount
+
+
+    def report(self):
+        """Return {stage name: summary} of every stage measured since the last reset"""
+        report = {}
+        with self._lock:
+            for stage_name, stage in self._stages.items():
+                summary = {'wall_time': 0, 'items': stage['items'], 'items_per_second': None}
+                if stage['first_start'] is not None:
+                    summary['wall_time'] = round(stage['last_end'] - stage['first_start'], 6)
+                if summary['wall_time'] > 0 and stage['items'] > 0:
+                    summary['items_per_second'] = round(stage['items'] / summary['wall_time'], 3)
+                if stage['latencies'] != []:
+                    latencies = np.array(stage['latencies'])
+                    summary['busy_time'] = round(float(latencies.sum()), 6)
+                    for percentile in self.PERCENTILES:
+                        summary[f'p{percentile}'] = round(float(np.percentile(latencies, percentile)), 6)
+                    summary['max'] = round(float(latencies.max()), 6)
+                if stage['counters'] != {}:
+                    summary['counters'] = dict(stage['counters'])
+                report[stage_name] = summary
+        return report
+
+
+    def save_report(self, run_name, print_report=True):
+        """Save report as logs/(run_name)_timings.json, so the stages of each run can be compared with earlier runs"""
+        report = {'run': run_name, 'finished': time.strftime('%Y-%m-%d %H:%M:%S'), 'stages': self.report()}
+        os.makedirs(FileNameConsts.log_folder_name, exist_ok=True)
+        file_location = f'{FileNameConsts.log_folder_name}/{run_name}_timings.json'
+        with open(file_location, 'w') as f:
+            json.dump(report, f, indent=2)
+        if print_report:
+            print(f"Timings of {run_name} (saved as {file_location}):")
+            for stage_name, summary in report['stages'].items():
+                line = f"  {stage_name:<28}{summary['wall_time']:>10.3f} s {summary['items']:>8} items"
+                if summary['items_per_second'] is not None:
+                    line += f" {summary['items_per_second']:>10.1f}/s"
+                if 'p50' in summary:
+                    line += f"   p50 {summary['p50'] * 1000:.1f} ms, p95 {summary['p95'] * 1000:.1f} ms, p99 {summary['p99'] * 1000:.1f} ms"
+                print(line)
+        return report
+
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+    def _get_stage(self, stage_name):
+        """Return the measurements of stage_name (the lock must be held)"""
+        if stage_name not in self._stages:
+            self._stages[stage_name] = {'first_start': None, 'last_end': None, 'items': 0, 'latencies': [], 'counters': {}}
+        return self._stages[stage_name]
+
+
+    def _record(self, stage_name, start, end, items, latency):
+        with self._lock:
+            stage = self._get_stage(stage_name)
+            if stage['first_start'] is None or start < stage['first_start']:
+                stage['first_start'] = start
+            if stage['last_end'] is None or end > stage['last_end']:
+                stage['last_end'] = end
+            stage['items'] += items
+            if latency is not None:
+                stage['latencies'].append(latency)
+
+
+instrumentation = Instrumentation()
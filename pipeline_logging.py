@@ -0,0 +1,103 @@
+#%%
+
+# Imports
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+# Helper functions and global constants
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+# Log level of each log type accepted by Utils.logger ('print' and 'none' are not logged)
+LOG_TYPE_LEVELS = {'debug': logging.DEBUG,
+                   'info': logging.INFO,
+                   'log': logging.INFO,
+                   'warning': logging.WARNING,
+                   'error': logging.ERROR,
+                   'critical': logging.CRITICAL}
+
+# Structured fields that can be added to a log record, e.g. logger.warning(message, extra={'course': '01005'})
+LOG_FIELDS = ['course', 'semester', 'stage']
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as '(time) LEVEL: message', followed by the structured fields of the record, e.g. [course=01005 stage=format_info]"""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = [f'{field}={getattr(record, field)}' for field in LOG_FIELDS if getattr(record, field, None) is not None]
+        if fields != []:
+            message += ' [' + ' '.join(fields) + ']'
+        return message
+
+
+class LogFileRouter(logging.Handler):
+    """Hand each record to the file handler of the logger that made it"""
+
+    def __init__(self, file_handlers):
+        super().__init__()
+        self.file_handlers = file_handlers
+
+    def emit(self, record):
+        self.file_handlers[record.name].handle(record)
+
+
+class PipelineLogging:
+    """ A named logger for each of the pipeline's log files (e.g. scrape_logs and format_logs), configured once.
+        The loggers only put records on a queue, and a QueueListener thread writes them to the log files,
+        so the scraping and formatting threads never wait for file I/O. The queue is flushed when the program exits """
+
+    LOGGER_PREFIX = 'pipeline'
+    LOG_FORMAT = '(%(asctime)s) %(levelname)s: %(message)s'
+
+    def __init__(self, folder_name=FileNameConsts.log_folder_name, level=Config.log_level):
+        self.folder_name = folder_name
+        self.level = level
+        self._queue = queue.SimpleQueue()
+        self._file_handlers = {}
+        self._listener = None
+        self._lock = threading.Lock()
+
+
+    def get_logger(self, log_file_name):
+        """Return the logger that writes to log_file_name.log"""
+        logger_name = f'{self.LOGGER_PREFIX}.{log_file_name}'
+        if logger_name not in self._file_handlers:
+            with self._lock:
+                if logger_name not in self._file_handlers:
+                    self._configure(logger_name, log_file_name)
+        return logging.getLogger(logger_name)
+
+
+    def stop(self):
+        """Write the records left on the queue and close the log files"""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+            for file_handler in self._file_handlers.values():
+                file_handler.close()
+
+
+    def _configure(self, logger_name, log_file_name):
+        """Create the file handler of a logger, and start the listener on first use (the lock must be held)"""
+        os.makedirs(self.folder_name, exist_ok=True)
+        file_handler = logging.FileHandler(f'{self.folder_name}/{log_file_name}.log', encoding='utf-8', delay=True)
+        file_handler.setFormatter(StructuredFormatter(self.LOG_FORMAT))
+        self._file_handlers[logger_name] = file_handler
+
+        logger = logging.getLogger(logger_name)
+        logger.setLevel(self.level)
+        logger.propagate = False
+        logger.addHandler(logging.handlers.QueueHandler(self._queue))
+
+        if self._listener is None:
+            self._listener = logging.handlers.QueueListener(self._queue, LogFileRouter(self._file_handlers))
+            self._listener.start()
+            atexit.register(self.stop)
+
+
+pipeline_logging = PipelineLogging()
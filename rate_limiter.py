@@ -0,0 +1,33 @@
+#%%
+
+# Imports
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class RateLimiter:
+    """ Space out requests so that each host receives at most requests_per_second.
+        The limiter is shared between threads, and every thread calls wait(url)
+        right before it sends a request to url """
+
+    def __init__(self, requests_per_second):
+        self.min_interval = 0
+        if requests_per_second:
+            self.min_interval = 1 / requests_per_second
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until the host of url has a free request slot"""
+        if self.min_interval == 0:
+            return
+        host = urlsplit(url).netloc
+        # Reserve a slot while holding the lock, but sleep without holding it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
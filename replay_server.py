@@ -0,0 +1,309 @@
+#%%
+
+# Imports
+import argparse
+import contextlib
+import glob
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+# Helper functions and global constants
+from instrumentation import instrumentation
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+# Initialization
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+RECORDING_FOLDER = 'html_persistence' # The folder HtmlPersistence saves to
+BASE_URL_SETTINGS = ['grades_base_url', 'info_base_url', 'evaluations_base_url']
+SCRAPERS = ['course_numbers', 'grades', 'info', 'evaluations']
+
+# HtmlPersistence saves sliced page sources, so they are served inside a page with the head the fetcher validates
+PAGE_TEMPLATE = '<!DOCTYPE html><html><head><meta name="viewport" content="width=device-width, initial-scale=1" /></head><body>{}</body></html>'
+NOT_FOUND_PAGE = '<h2>404 - File or directory not found.</h2>'
+SERVER_ERROR_PAGE = "<span><H1>Server Error in '/' Application.</H1></span>"
+
+# The course number in the path of a recorded page
+COURSE_PATTERNS = [re.compile(r'/Histogram/1/(\w+)/'), re.compile(r'/course/[\d-]+/(\w+)$'), re.compile(r'/kursus/(\w+)/')]
+
+
+def exam_period_of_term(term):
+    """'F22' becomes 'Summer-2022' and 'E21' becomes 'Winter-2021', as on karakterer.dtu.dk"""
+    if term[0] == 'F':
+        return 'Summer-20'+term[-2:]
+    return 'Winter-20'+term[-2:]
+
+
+def academic_year_of_term(term):
+    """'F22' becomes '2021-2022' and 'E22' becomes '2022-2023', as on kurser.dtu.dk"""
+    year = 2000 + int(term[-2:])
+    if term[0] == 'F':
+        year -= 1
+    return f'{year}-{year + 1}'
+
+
+def recording_path(kind, course, term):
+    """Return the path that a page recorded by HtmlPersistence has on the DTU sites"""
+    if kind == 'grades':
+        return f'/Histogram/1/{course}/{exam_period_of_term(term)}'
+    elif kind == 'information':
+        return f'/course/{academic_year_of_term(term)}/{course}'
+    elif kind == 'evaluations':
+        # The real path ends with an id that is only found by searching, the term is used instead
+        return f'/kursus/{course}/{term}'
+    return None
+
+
+def load_recordings(folder_name):
+    """ Return {path: page source} of the pages recorded by HtmlPersistence, i.e. (term)_grades.json,
+        (term)_evaluations.json and (term)_information.json, each holding {course: page source} """
+    pages = {}
+    for file_location in sorted(glob.glob(f'{folder_name}/*_*.json')):
+        term, kind = os.path.basename(file_location)[:-len('.json')].split('_', 1)
+        with open(file_location, encoding='utf-8') as f:
+            recorded_pages = json.load(f)
+        for course, page_source in recorded_pages.items():
+            path = recording_path(kind, course, term)
+            if path is not None and page_source != '':
+                pages[path] = PAGE_TEMPLATE.format(page_source)
+    return pages
+
+
+def load_html_cache(folder_name):
+    """ Return {path: page source} of the pages in an HtmlCache folder. Pages that did not exist are left out,
+        and so are cached evaluation searches, as the replay server makes its own """
+    pages = {}
+    for file_location in glob.glob(f'{folder_name}/*/*.json.gz'):
+        with gzip.open(file_location, 'rt', encoding='utf-8') as f:
+            entry = json.load(f)
+        url = urlsplit(entry['url'])
+        if entry['status_code'] == 200 and url.path != '/CourseSearch':
+            pages[url.path + ('?' + url.query if url.query else '')] = entry['page_source']
+    return pages
+
+
+class ReplayServer:
+    """ Local stand-in for karakterer.dtu.dk, kurser.dtu.dk and evaluering.dtu.dk, serving recorded page sources.
+        All three sites are served from one port, as their paths do not overlap. Each response waits latency seconds,
+        plus or minus up to jitter, and a share of the requests fail with 500 (error_rate) or 404 (not_found_rate),
+        drawn from a seeded random generator. Pages are served with an ETag, so a cached page that is revalidated is
+        answered with 304 Not Modified. The evaluation search, the course number search and the course responsible
+        pages (which HtmlPersistence does not record) are made from the recorded courses """
+
+    def __init__(self, pages, course_names=None, latency=Config.replay_latency, jitter=Config.replay_jitter,
+                 error_rate=Config.replay_error_rate, not_found_rate=Config.replay_not_found_rate, seed=0, host='127.0.0.1', port=0):
+        self.pages = pages
+        self.course_names = course_names or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.host = host
+        self.port = port
+        self.status_counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+        # Evaluation paths of each course, for the evaluation search
+        self._evaluation_paths = {}
+        self._courses = set()
+        for path in pages:
+            for pattern in COURSE_PATTERNS:
+                match = pattern.search(path)
+                if match is not None:
+                    self._courses.add(match.group(1))
+                    if path.startswith('/kursus/'):
+                        self._evaluation_paths.setdefault(match.group(1), []).append(path)
+
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self._server.server_port}'
+
+
+    def courses(self):
+        """Return sorted list of the courses that have recorded pages"""
+        return sorted(self._courses)
+
+
+    def start(self):
+        """Serve requests on a background thread and return the url of the server"""
+        self._server = ThreadingHTTPServer((self.host, self.port), ReplayRequestHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+    def use_as_base_url(self):
+        """Point the scrapers' base url settings at the server, and return the previous settings"""
+        previous_settings = {setting: getattr(Config, setting) for setting in BASE_URL_SETTINGS}
+        for setting in BASE_URL_SETTINGS:
+            setattr(Config, setting, self.url)
+        return previous_settings
+
+
+    def respond(self, path, if_none_match=None):
+        """Return (status code, page source, etag) of the response to a GET request of path"""
+        with self._lock:
+            delay = max(0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            draw = self._random.random()
+        time.sleep(delay)
+
+        etag = None
+        if draw < self.error_rate:
+            status_code, page_source = 500, SERVER_ERROR_PAGE
+        elif draw < self.error_rate + self.not_found_rate:
+            status_code, page_source = 404, NOT_FOUND_PAGE
+        else:
+            page_source = self.page_source(path)
+            if page_source is None:
+                status_code, page_source = 404, NOT_FOUND_PAGE
+            else:
+                status_code = 200
+                etag = '"' + hashlib.sha1(page_source.encode('utf-8')).hexdigest() + '"'
+                if if_none_match == etag:
+                    status_code, page_source = 304, ''
+        with self._lock:
+            self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+        return status_code, page_source, etag
+
+
+    def page_source(self, path):
+        """Return the page source of path, or None if there is no such page"""
+        if path in self.pages:
+            return self.pages[path]
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        if url.path == '/CourseSearch' and 'CourseCode' in query:
+            links = [f'<a href="{self.url}{evaluation_path}">{evaluation_path}</a>' for evaluation_path in self._evaluation_paths.get(query['CourseCode'][0], [])]
+            return PAGE_TEMPLATE.format('<br />'.join(links))
+        elif url.path == '/search':
+            # Same format as the course list of kurser.dtu.dk
+            links = [f' <a href="/course/{course}">{course} - {self.course_names.get(course, course)}</a><br />' for course in self.courses()]
+            return PAGE_TEMPLATE.format(''.join(links))
+        match = re.fullmatch(r'/course/(\w+)/info', url.path)
+        if match is not None and match.group(1) in self._courses:
+            return PAGE_TEMPLATE.format('')
+        return None
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    """Answer GET requests with the responses of the ReplayServer"""
+    protocol_version = 'HTTP/1.1' # Connections are kept alive, as by the DTU servers
+
+    def do_GET(self):
+        status_code, page_source, etag = self.server.replay.respond(self.path, self.headers.get('If-None-Match'))
+        body = page_source.encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+#%%
+
+def run_scrapers(server, scraper_names):
+    """ Run the scrapers against the replay server, for the courses it has recorded. They run in a temporary folder,
+        so the scraped data, html cache and journals are never touched, and the html cache starts out empty """
+    # The scrapers are only imported when needed, as they import selenium
+    from pipeline_logging import pipeline_logging
+    from scrape_course_numbers import scrape_course_numbers
+    from scrape_evaluations import scrape_evaluations
+    from scrape_grades import scrape_grades
+    from scrape_info import scrape_info
+
+    courses = server.courses()
+    previous_base_urls = server.use_as_base_url()
+    previous_fetch_modes = Config.fetch_modes
+    Config.fetch_modes = {**Config.fetch_modes, Config.source_evaluation_search: 'http'}
+    work_folder = tempfile.mkdtemp(prefix='replay_scrape_')
+    try:
+        os.chdir(work_folder)
+        for scraper_name in scraper_names:
+            print(f"Scraping {scraper_name} from {server.url}...")
+            # The scrapers print progress for every course, which is not what is measured
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), instrumentation.stage(f'replay_{scraper_name}', len(courses)):
+                if scraper_name == 'course_numbers':
+                    scrape_course_numbers()
+                elif scraper_name == 'grades':
+                    scrape_grades(courses, Config.course_semesters, FileNameConsts.grade_df)
+                elif scraper_name == 'info':
+                    scrape_info(courses, FileNameConsts.info_df)
+                elif scraper_name == 'evaluations':
+                    scrape_evaluations(courses, FileNameConsts.eval_df)
+    finally:
+        os.chdir(REPO_FOLDER)
+        pipeline_logging.stop()
+        shutil.rmtree(work_folder, ignore_errors=True)
+        Config.fetch_modes = previous_fetch_modes
+        for setting, base_url in previous_base_urls.items():
+            setattr(Config, setting, base_url)
+
+
+def load_course_names():
+    """Return {course: name} of the last course number scrape, used for the replayed course number search"""
+    file_location = os.path.join(REPO_FOLDER, FileNameConsts.scraped_data_folder_name, FileNameConsts.course_number_json + '.json')
+    if not os.path.exists(file_location):
+        return {}
+    with open(file_location) as f:
+        return json.load(f)
+
+
+#%%
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve recorded DTU page sources locally, so the scrapers can run (and be benchmarked) without network')
+    parser.add_argument('--recordings', default=RECORDING_FOLDER, help='folder of page sources saved by HtmlPersistence')
+    parser.add_argument('--html-cache', help='also serve the pages of an html cache folder, e.g. scraped_data/html_cache')
+    parser.add_argument('--port', type=int, default=8000, help='port to serve on (0 picks a free port)')
+    parser.add_argument('--latency', type=float, default=Config.replay_latency, help='seconds to wait before each response')
+    parser.add_argument('--jitter', type=float, default=Config.replay_jitter, help='largest random deviation from the latency, in seconds')
+    parser.add_argument('--error-rate', type=float, default=Config.replay_error_rate, help='share of requests answered with 500')
+    parser.add_argument('--not-found-rate', type=float, default=Config.replay_not_found_rate, help='share of requests answered with 404')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the latency, error and 404 draws')
+    parser.add_argument('--scrape', nargs='+', choices=SCRAPERS, help='run these scrapers against the server and save their timings, instead of serving until interrupted')
+    args = parser.parse_args()
+
+    PAGES = load_recordings(args.recordings) if os.path.isdir(args.recordings) else {}
+    if args.html_cache is not None:
+        PAGES.update(load_html_cache(args.html_cache))
+    SERVER = ReplayServer(PAGES, load_course_names(), args.latency, args.jitter, args.error_rate, args.not_found_rate, args.seed, port=args.port)
+    URL = SERVER.start()
+    print(f"Replaying {len(PAGES)} pages of {len(SERVER.courses())} courses at {URL}")
+
+    try:
+        if args.scrape is not None:
+            run_scrapers(SERVER, args.scrape)
+            instrumentation.save_report('replay_scrape')
+        else:
+            print(f"Set {', '.join(BASE_URL_SETTINGS)} in Config to {URL} to scrape from it. Press Ctrl+C to stop")
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SERVER.stop()
+        print(f"Responses by status code: {dict(sorted(SERVER.status_counts.items()))}")
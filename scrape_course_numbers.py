@@ -2,18 +2,27 @@
 
 # Imports
 # Helper functions and global constants
+from http_fetcher import HttpFetcher
+from instrumentation import instrumentation
+from selenium_pool import LazyDriver
 from utils import Utils
+from website.global_constants.config import Config
 from website.global_constants.file_name_consts import FileNameConsts
 
 
+@instrumentation.timed('scrape_course_numbers')
 def scrape_course_numbers():
     """Create and save a dict of all DTU course numbers and their names."""
 
     # The following url contains a list of all DTU courses
     print('Beginning the course number scrape...')
-    driver = Utils.launch_selenium()
-    url = "https://kurser.dtu.dk/search?CourseCode=&SearchKeyword=&Department=1&Department=10&Department=11&Department=12&Department=13&Department=22&Department=23&Department=24&Department=25&Department=26&Department=27&Department=28&Department=29&Department=30&Department=31&Department=33&Department=34&Department=36&Department=38&Department=41&Department=42&Department=46&Department=47&Department=59&Department=IHK&Department=83&CourseType=&TeachingLanguage=&Volume="
-    html_raw = Utils.access_url_via_selenium(url, driver)
+    fetcher = HttpFetcher()
+    driver = LazyDriver(Utils.launch_selenium)
+    url = Config.info_base_url+"/search?CourseCode=&SearchKeyword=&Department=1&Department=10&Department=11&Department=12&Department=13&Department=22&Department=23&Department=24&Department=25&Department=26&Department=27&Department=28&Department=29&Department=30&Department=31&Department=33&Department=34&Department=36&Department=38&Department=41&Department=42&Department=46&Department=47&Department=59&Department=IHK&Department=83&CourseType=&TeachingLanguage=&Volume="
+    html_raw = fetcher.get_validated_page_source(url, Config.source_course_numbers)
+    if html_raw == '':
+        html_raw = Utils.access_url_via_selenium(url, driver)
+        fetcher.store_page_source(url, html_raw)
 
     # Initialize dictionary of all course names with course number as key
     course_dictionary = {}
@@ -49,10 +58,11 @@ def scrape_course_numbers():
     file_name = FileNameConsts.course_number_json
     Utils.save_dct_as_json(file_name, course_dictionary)
 
-    # Terminate selenium web driver
-    driver.quit
+    # Terminate selenium web driver (if it was ever launched)
+    driver.quit()
 
 #%%
 if __name__ == "__main__":
 
-    scrape_course_numbers()
\ No newline at end of file
+    scrape_course_numbers()
+    instrumentation.save_report('scrape_course_numbers')
\ No newline at end of file
@@ -1,29 +1,40 @@
 #%%
 
 # Imports
+import argparse
 import bs4 as bs
-import urllib.request
+import json
+import urllib3
 from selenium.webdriver.common.by import By
 # Helper functions and global constants
-from utils import Utils
+from http_fetcher import HttpFetcher
+from instrumentation import instrumentation
+from scrape_journal import ScrapeJournal
+from selenium_pool import SeleniumDriverPool
+from utils import DfRowBuilder, Utils
+from website.global_constants.config import Config
 from website.global_constants.eval_consts import EvalConsts
 from website.global_constants.file_name_consts import FileNameConsts
 
-# These two imports will fix ssl.SSLCertVerificationError
-import ssl
-ssl._create_default_https_context = ssl._create_unverified_context
+# evaluering.dtu.dk raises ssl.SSLCertVerificationError, so its certificate is not verified
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
-def scrape_evaluations(course_numbers, file_name):
-    """Scrape grades for a given set of courses and href digits"""
+def scrape_evaluations(course_numbers, file_name, pool_size=Config.selenium_pool_size, resume=False):
+    """ Scrape grades for a given set of courses and href digits.
+        The courses are split between pool_size webdrivers, and if resume is True, courses completed by an interrupted run are skipped """
 
 
     def scrape_url(url):
         """ Get page source from url, split it at /n and return it as list.
             Note that this is some old and ugly code that I have not bothered to clean up"""
-        # Load page source from url
-        source = urllib.request.urlopen(url).read()
-        soup = bs.BeautifulSoup(source,'lxml')
+        # Load page source from url (or from cache)
+        source = fetcher.get_page_source(url, Config.source_evaluations)
+        # A failed fetch fails the course, so the driver pool tries it again
+        if source is None:
+            raise ConnectionError(f"Failed to fetch evaluation at url: {url}")
+        with instrumentation.item('parse_evaluations'):
+            soup = bs.BeautifulSoup(source,'lxml')
         scraped_html = ''
         # A string containing the 'Results' section of the web page is created
         for paragraph in soup.find_all(id='Results'):
@@ -58,11 +69,11 @@ def scrape_evaluations(course_numbers, file_name):
             course_period = 'F'+scraped_html[0][-2:]
         else: # Period format is invalid
             message = f"{file_name}, {course_number}: Semester format unknown"
-            Utils.logger(message, 'Error', FileNameConsts.scrape_log_name)
+            Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course_number, stage=file_name)
         return [course_number, course_period]
 
 
-    def extract_evaluation_data(scraped_data, course_period):
+    def extract_evaluation_data(scraped_data, course_period, course):
         """ Extract evaluations from scrapedData and return them as dict
             Note that this is some old and ugly code that I have not bothered to clean up"""
         # In Sep-2019, the old evaluation questions were replaced by new ones
@@ -132,7 +143,7 @@ def scrape_evaluations(course_numbers, file_name):
                 expected_answer = answers_to_first_questions
             if scraped_data[index_of_question+1] != expected_answer:
                 message = f"{file_name}, {course}: {scraped_data[index_of_question+1]} != {expected_answer}, (i={i}) "
-                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name)
+                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course, stage=file_name)
                 return {} # Error
             # 2 of 2: Is sum of evalValues == 'x besvarelser' in scrapedData?
             try:
@@ -141,13 +152,13 @@ def scrape_evaluations(course_numbers, file_name):
                     message = f"{file_name}, {course}: Data bugged: {sum(eval_values)} != {response_count} (i={i})"
                     # Sometimes the 'x besvarelser' is slightly off
                     if -2 <= sum(eval_values) - response_count <= 2:
-                        Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name)
+                        Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name, course=course, stage=file_name)
                     else:
-                        Utils.logger(message, 'Error', FileNameConsts.scrape_log_name)
+                        Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course, stage=file_name)
                         return {} # Error
             except: # sum(eval_values) must not contain strings
                 message = f"{file_name}, {course}: sum(evalValues) failed, (i={i}), {eval_values}"
-                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name)
+                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course, stage=file_name)
                 return {} # Error
 
             # Both tests were passed - Adding answers to dictionary
@@ -155,26 +166,22 @@ def scrape_evaluations(course_numbers, file_name):
         return eval_dict
 
 
-#%% Start of main script
-
-    # Constants that specifies how Selenium can find the correct elements
-    URL = 'https://evaluering.dtu.dk/CourseSearch'
-    COURSE_INPUT = '//*[@id="CourseCodeTextbox"]'
-    SEARCH_SUBMIT = '//*[@id="SearchButton"]'
+    def get_evaluation_urls(driver, course):
+        """ Search for the course and return the urls of its evaluations. The search can't be done
+            over plain http, so the resulting list of urls is cached (as json) under a made-up url instead """
+        search_url = f'{URL}?CourseCode={course}'
+        evaluation_url_start = f'{Config.evaluations_base_url}/kursus/'
+        if Config.fetch_modes.get(Config.source_evaluation_search) == 'http':
+            # Only a replay server answers the search over http, so its result is not cached
+            page_source = fetcher.get_page_source(search_url)
+            if page_source is None:
+                raise ConnectionError(f"Failed to fetch evaluation search at url: {search_url}")
+            soup = bs.BeautifulSoup(page_source, 'lxml')
+            return [a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith(evaluation_url_start)]
+        cached_urls = fetcher.get_cached_page_source(search_url, Config.source_evaluation_search)
+        if cached_urls != '':
+            return json.loads(cached_urls)
 
-    # Begin the webscrape and initialize the data frame
-    df, lst_of_column_names, df_index = Utils.initialize_df(EvalConsts.list_of_evals)
-    driver = Utils.launch_selenium()
-
-    # Loop through all courses
-    print('Webscrape of evaluations will now begin...')
-    iteration_count = 0
-    for course in course_numbers:
-        df_row = {df_index: course}
-
-        # In order to scrape the evaluations, we must first obtain the url for a given set of evaluations
-        # This is done by going to 'https://evaluering.dtu.dk/CourseSearch' and, for each course, searching for all evaluations
-        # This will return a list of href elements, each of which links to an evaluation for the specified course
         evaluation_urls = []
         driver.get(URL)
         driver.find_element(By.XPATH, COURSE_INPUT).send_keys(course)
@@ -183,40 +190,92 @@ def scrape_evaluations(course_numbers, file_name):
         hrefs = driver.find_elements(By.PARTIAL_LINK_TEXT, '')
         for href in hrefs:
             href_as_string = href.get_attribute("href")
-            if len(href_as_string) >= 33 and href_as_string[0:33] == 'https://evaluering.dtu.dk/kursus/':
+            if href_as_string.startswith(evaluation_url_start):
                 evaluation_urls.append(href_as_string)
+        fetcher.store_page_source(search_url, json.dumps(evaluation_urls))
+        return evaluation_urls
 
 
+    @instrumentation.timed('scrape_evaluations')
+    def scrape_course(driver, course):
+        """Scrape all evaluations for a single course and return them as a df row"""
+        df_row = {df_index: course}
+
+        # In order to scrape the evaluations, we must first obtain the url for a given set of evaluations
+        # This is done by going to 'https://evaluering.dtu.dk/CourseSearch' and, for each course, searching for all evaluations
+        # This will return a list of href elements, each of which links to an evaluation for the specified course
+        evaluation_urls = get_evaluation_urls(driver, course)
+
         # Loop through each evaluation for specified course
         for eval_url in evaluation_urls:
             page_source = scrape_url(eval_url)
+            # A page that does not exist (404) has no results, only that evaluation is skipped
+            if page_source == []:
+                message = f"{file_name}, {course}: No evaluation results found at url: {eval_url}"
+                Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name, course=course, stage=file_name)
+                continue
 
             # Extract course number and course period from scraped data
             scraped_course_number, course_period = get_course_number_and_period(page_source)
             # Check that the extracted course number matches course[k]
             if scraped_course_number != course:
-                message = f"{file_name}, {course_numbers[course]}: Wrong course number ({scraped_course_number})"
-                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name)
+                message = f"{file_name}, {course}: Wrong course number ({scraped_course_number})"
+                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course, stage=file_name)
                 continue
 
             # Extract studente evaluation data from scrapedData
-            semester_data = extract_evaluation_data(page_source, course_period)
+            semester_data = extract_evaluation_data(page_source, course_period, course)
             # If extraction failed, the returned dict will be empty
             df_row.update(semester_data)
 
-        # Concatenate dict to dataframe as a new row
-        df = Utils.add_dict_to_df(df_row, lst_of_column_names, df)
+        return df_row
+
+
+#%% Start of main script
+
+    # Constants that specifies how Selenium can find the correct elements
+    URL = f'{Config.evaluations_base_url}/CourseSearch'
+    COURSE_INPUT = '//*[@id="CourseCodeTextbox"]'
+    SEARCH_SUBMIT = '//*[@id="SearchButton"]'
+
+    # Begin the webscrape and initialize the data frame
+    df, lst_of_column_names, df_index = Utils.initialize_df(EvalConsts.list_of_evals)
+    row_builder = DfRowBuilder(lst_of_column_names, df)
+    fetcher = HttpFetcher(verify_ssl=False)
+    driver_pool = SeleniumDriverPool(pool_size)
+
+    journal = ScrapeJournal(file_name, resume)
+
+    # Loop through all courses, the pool returns the df rows in the same order as course_numbers
+    print('Webscrape of evaluations will now begin...')
+    iteration_count = 0
+    remaining_courses = [course for course in course_numbers if course not in journal]
+    scraped_rows = driver_pool.map(scrape_course, remaining_courses, file_name)
+    for course in course_numbers:
+        if course in journal:
+            df_row = journal.get_row(course)
+        else:
+            df_row = next(scraped_rows)
+            # Failed courses are not journaled, so they are retried when the scrape is resumed
+            if df_row is None:
+                df_row = {df_index: course}
+            else:
+                journal.append(df_row)
+
+        # Add dict to the row builder as a new row
+        row_builder.add_dict(df_row)
 
         # Print current course to console so user can track the progress
         iteration_count += 1
         Utils.print_progress(iteration_count, course_numbers, df_row, file_name)
+    journal.close()
+    df = row_builder.to_df()
 
     # Save all evaluations as df
     Utils.save_scraped_df(df, file_name)
     Utils.save_df_as_csv(df, file_name)
+    journal.remove()
 
-    # End of program
-    driver.quit
     # Webscrape for all courses and semesters has been completed
     print()
     print('Webscrape of evaluations is now completed! Check log for details.')
@@ -227,9 +286,14 @@ def scrape_evaluations(course_numbers, file_name):
 
 #%%
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scrape evaluations for all DTU courses')
+    parser.add_argument('--resume', action='store_true', help='skip the courses completed by an interrupted run')
+    args = parser.parse_args()
+
         # Variables and initialization
     COURSE_NUMBERS = Utils.get_course_numbers()
     #COURSE_NUMBERS = ['01005', '02105']
 
     eval_df_name = FileNameConsts.eval_df
-    scrape_evaluations(COURSE_NUMBERS, eval_df_name)
\ No newline at end of file
+    scrape_evaluations(COURSE_NUMBERS, eval_df_name, resume=args.resume)
+    instrumentation.save_report('scrape_evaluations')
\ No newline at end of file
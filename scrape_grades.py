@@ -1,17 +1,24 @@
 #%%
 
 # Imports
+import argparse
 import pandas as pd
-import urllib
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 # Helper functions and global constants
-from utils import Utils
+from http_fetcher import HttpFetcher
+from instrumentation import instrumentation
+from scrape_journal import ScrapeJournal
+from utils import DfRowBuilder, Utils
 from website.global_constants.config import Config
 from website.global_constants.file_name_consts import FileNameConsts
 from website.global_constants.grade_consts import GradeConsts
 
 
-def scrape_grades(course_numbers, course_semesters, file_name):
-    """Scrape grades for a given set of courses and semesters"""
+def scrape_grades(course_numbers, course_semesters, file_name, max_workers=Config.scrape_max_workers, requests_per_second=Config.scrape_requests_per_second, resume=False):
+    """ Scrape grades for a given set of courses and semesters.
+        Urls are fetched by a pool of max_workers threads, and each host receives at most requests_per_second.
+        If resume is True, courses completed by an interrupted run are loaded from its journal instead """
 
     def exam_period_from_semester(course_semesters):
         """ Convert each semester in a list to its corresponding exam period,
@@ -29,18 +36,27 @@ def scrape_grades(course_numbers, course_semesters, file_name):
             else:
                 exam_periods.append('XXXXXX-20'+str(semester[-2:]))
                 message = f"{file_name}: Invalid semester: {course_semesters}"
-                Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+                Utils.logger(message, "Error", FileNameConsts.scrape_log_name, stage=file_name)
         return exam_periods
 
 
-    def scrape_grades_if_url_exists(url):
-        """ Pandas grabs the raw html of the specified url and attempts to extract any tables it can find. If the url links to
-            a valid exam period for the course, 3 tables will be found (the 3rd table contains the grades), and the grades are
-            formatted into a dict. If the url contains 0 tables, the exam period is invalid and an empty dict is returned instead."""
+    def scrape_grades_if_url_exists(url, course, exam_period):
+        """ The fetcher grabs the raw html of the specified url (or loads it from cache) and pandas attempts to extract any tables it can find.
+            If the url links to a valid exam period for the course, 3 tables will be found (the 3rd table contains the grades), and the grades are
+            formatted into a dict. If the url contains 0 tables (or does not exist), the exam period is invalid and an empty dict is returned instead.
+            If the page could not be fetched, None is returned, as the exam period might still exist."""
         df_found = False
+        page_source = fetcher.get_page_source(url, Config.source_grades)
+        if page_source is None:
+            message = f"{file_name}: {course}_{exam_period} Failed to fetch grades (url: {url})"
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, semester=exam_period, stage=file_name)
+            return None
+        elif page_source == '':
+            return {}
         try:
             # We assunme that if pd.read_html finds a table, the url contain grades
-            df = pd.read_html(url, header=0)
+            with instrumentation.item('parse_grades'):
+                df = pd.read_html(StringIO(page_source), header=0)
             # These grades are loaded into a dictionary based on the following code
             table_containing_grades = df[2]
             df_found = True
@@ -51,13 +67,13 @@ def scrape_grades(course_numbers, course_semesters, file_name):
             scraped_dict = {k.capitalize(): v for k, v in scraped_dict.items()}
 
         # If url is invalid (no table found), then return an empty dict
-        except (urllib.error.HTTPError, IndexError):
+        except (ValueError, IndexError):
             scraped_dict = {}
 
         # If the following ever happens it probably means that DTU has updated their website and I have to re-write my code
         if scraped_dict == {} and df_found == True:
-            message = f"{file_name}: {course}_{exam_periods[i]} Grades found on url but dict is empty (url: {url})"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            message = f"{file_name}: {course}_{exam_period} Grades found on url but dict is empty (url: {url})"
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, semester=exam_period, stage=file_name)
         return scraped_dict
 
 
@@ -93,7 +109,7 @@ def scrape_grades(course_numbers, course_semesters, file_name):
                 elif key == "Godkendt":
                     if scraped_dict["Godkendt"] != 0:
                         message = f"{file_name}: {course_number}_{course_semester} grade 'Godkendt' now exists!"
-                        Utils.logger(message, "Warning", FileNameConsts.scrape_log_name)
+                        Utils.logger(message, "Warning", FileNameConsts.scrape_log_name, course=course_number, semester=course_semester, stage=file_name)
                 else:
                 # For current semester, add to dict how many students optained the grade in question
                     new_key = f"{course_semester}_{grade_renaming[key]}"
@@ -104,6 +120,14 @@ def scrape_grades(course_numbers, course_semesters, file_name):
         return grades_dict
 
 
+    @instrumentation.timed('scrape_grades')
+    def scrape_exam_period(job):
+        """Scrape the grades of a single (course, exam period index) job. Runs on a worker thread"""
+        course, i = job
+        url = f'{Config.grades_base_url}/Histogram/1/{course}/{exam_periods[i]}'
+        return scrape_grades_if_url_exists(url, course, exam_periods[i])
+
+
 #%% Start of main script
 
     # Get list of exam periods to be scraped based on list of semesters
@@ -113,33 +137,58 @@ def scrape_grades(course_numbers, course_semesters, file_name):
     # Begin the webscrape and initialize the data frame
     print('Webscrape of grades will now begin...')
     df, lst_of_column_names, df_index = Utils.initialize_df(GradeConsts.list_of_grades)
-    # Loop through all courses
-    iteration_count = 0
-    for course in course_numbers:
-        df_row = {df_index: course}
+    row_builder = DfRowBuilder(lst_of_column_names, df)
+    fetcher = HttpFetcher(requests_per_second=requests_per_second)
+
+    journal = ScrapeJournal(file_name, resume)
+
+    # Each course and exam period combination is a job. The jobs are scraped concurrently,
+    # but executor.map returns the results in job order, so the df rows keep their order
+    remaining_courses = [course for course in course_numbers if course not in journal]
+    jobs = [(course, i) for course in remaining_courses for i in range(0, len(exam_periods))]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        scraped_results = executor.map(scrape_exam_period, jobs)
+
+        # Loop through all courses
+        iteration_count = 0
+        for course in course_numbers:
+            if course in journal:
+                df_row = journal.get_row(course)
+            else:
+                df_row = {df_index: course}
+                fetch_failed = False
 
-        # Loop through all semesters for each course
-        for i in range (0, len(exam_periods)):
+                # Loop through all semesters for each course
+                for i in range (0, len(exam_periods)):
 
-            # Attempt to scrape grades if the exam period exists
-            url = f'https://karakterer.dtu.dk/Histogram/1/{course}/{exam_periods[i]}'
-            scraped_grades_dct = scrape_grades_if_url_exists(url)
+                    # Grades are empty if the exam period does not exist, and None if they could not be fetched
+                    scraped_grades_dct = next(scraped_results)
+                    if scraped_grades_dct is None:
+                        fetch_failed = True
+                        scraped_grades_dct = {}
 
-            # Add grades to dictionary if url exists
-            single_semester_dict = format_scraped_dict(scraped_grades_dct, course, course_semesters[i])
-            df_row.update(single_semester_dict)
+                    # Add grades to dictionary if url exists
+                    single_semester_dict = format_scraped_dict(scraped_grades_dct, course, course_semesters[i])
+                    df_row.update(single_semester_dict)
 
-        # Concatenate dict to dataframe as a new row
-        df = Utils.add_dict_to_df(df_row, lst_of_column_names, df)
+                # Failed courses are not journaled, so they are retried when the scrape is resumed
+                if not fetch_failed:
+                    journal.append(df_row)
 
-        # Print current course to console so user can track the progress
-        iteration_count += 1
-        Utils.print_progress(iteration_count, course_numbers, df_row, file_name)
+            # Add dict to the row builder as a new row
+            row_builder.add_dict(df_row)
+
+            # Print current course to console so user can track the progress
+            iteration_count += 1
+            Utils.print_progress(iteration_count, course_numbers, df_row, file_name)
+    journal.close()
+    df = row_builder.to_df()
 
 
     # Save all grades as df
     Utils.save_scraped_df(df, file_name)
     Utils.save_df_as_csv(df, file_name)
+    journal.remove()
 
     # Webscrape for all courses and semesters has been completed
     print()
@@ -151,10 +200,15 @@ def scrape_grades(course_numbers, course_semesters, file_name):
 
 #%%
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scrape grades for all DTU courses')
+    parser.add_argument('--resume', action='store_true', help='skip the courses completed by an interrupted run')
+    args = parser.parse_args()
+
     # Variables and initialization
     COURSE_NUMBERS = Utils.get_course_numbers()
     #COURSE_NUMBERS = ['01005', '01017']
 
     course_semesters = Config.course_semesters
     grade_df_name = FileNameConsts.grade_df
-    scrape_grades(COURSE_NUMBERS, course_semesters, grade_df_name)
\ No newline at end of file
+    scrape_grades(COURSE_NUMBERS, course_semesters, grade_df_name, resume=args.resume)
+    instrumentation.save_report('scrape_grades')
\ No newline at end of file
@@ -1,12 +1,17 @@
 #%%
 
 # Imports
+import argparse
 import pandas as pd
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 # Helper functions and global constants
-from utils import Utils
+from http_fetcher import HttpFetcher
+from instrumentation import instrumentation
+from scrape_journal import ScrapeJournal
+from selenium_pool import SeleniumDriverPool
+from utils import DfRowBuilder, Utils
 from website.global_constants.config import Config
 from website.global_constants.dtu_consts import DtuConsts
 from website.global_constants.file_name_consts import FileNameConsts
@@ -16,24 +21,31 @@ from website.global_constants.info_consts import InfoConsts
 # AND PLACE NEW VERSION IN C:\Program Files (x86)\ChromeDriver
 
 
-def scrape_info(course_numbers, file_name):
-    """Scrape the info screen for a course"""
+def scrape_info(course_numbers, file_name, pool_size=Config.selenium_pool_size, resume=False):
+    """ Scrape the info screen for a course.
+        The courses are split between pool_size webdrivers, and if resume is True, courses completed by an interrupted run are skipped """
 
 
-    def get_course_info_page_source(course_number):
-        """Open course's info page with webdriver and return the page source"""
-        url = 'https://kurser.dtu.dk/course/'+str(Config.course_years)+course_number
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "viewport")))
-        page_source = driver.page_source
+    def get_course_info_page_source(driver, course_number):
+        """Fetch course's info page over http (or open it with webdriver as fallback) and return the page source"""
+        url = Config.info_base_url+'/course/'+str(Config.course_years)+course_number
+        page_source = fetcher.get_validated_page_source(url, Config.source_info)
+        if page_source == '':
+            driver.get(url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "viewport")))
+            page_source = driver.page_source
+            fetcher.store_page_source(url, page_source)
         return page_source
 
-    def get_course_responsible_page_source(course_number):
-        """Open course's info page with webdriver and return the page source"""
-        url = 'https://kurser.dtu.dk/course/'+course_number+'/info'
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "viewport")))
-        page_source = driver.page_source
+    def get_course_responsible_page_source(driver, course_number):
+        """Fetch course's responsible page over http (or open it with webdriver as fallback) and return the page source"""
+        url = Config.info_base_url+'/course/'+course_number+'/info'
+        page_source = fetcher.get_validated_page_source(url, Config.source_responsible)
+        if page_source == '':
+            driver.get(url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "viewport")))
+            page_source = driver.page_source
+            fetcher.store_page_source(url, page_source)
         return page_source
 
     def convert_html_df_into_dict(html_df):
@@ -82,36 +94,27 @@ def scrape_info(course_numbers, file_name):
 
 
 
-#%%
-
-    # Begin the webscrape and initialize the data frame
-    df_index = FileNameConsts.df_index
-    df_columns = {}
-    lst_of_column_names = [df_index] + InfoConsts.scrape_info_column_names
-    for column_name in lst_of_column_names:
-        df_columns[column_name] = []
-    df = pd.DataFrame(data = df_columns)
-    driver = Utils.launch_selenium()
-
-    # Loop through all courses
-    print('Webscrape of evaluations will now begin...')
-    iteration_count = 0
-    for course in course_numbers:
+    @instrumentation.timed('scrape_info')
+    def scrape_course(driver, course):
+        """ Scrape info and course responsibles for a single course and return them as a df row.
+            Errors when loading a page are not caught, so the driver pool retries the course, and a course
+            that keeps failing is not journaled (it would otherwise be saved with only part of its info) """
         df_row = {df_index: course}
 
         # Scrape all info inside the dataframe found on the webpage
+        page_source = get_course_info_page_source(driver, course)
         try:
-            page_source = get_course_info_page_source(course)
-            html_df = pd.read_html(page_source)
+            with instrumentation.item('parse_info'):
+                html_df = pd.read_html(page_source)
             # The current version of the dtu website contains a df of length 3
             if len(html_df) != 3:
                 message = f"{file_name}, {course}: len(df) is {str(len(html_df))} instead of 3"
-                Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name)
+                Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name, course=course, stage=file_name)
             info_dct = convert_html_df_into_dict(html_df)
             df_row.update(info_dct)
         except:
-            message = f"{file_name}, {course}: Timeout when loading URL"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            message = f"{file_name}, {course}: Error when reading the info tables"
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape study lines
         try:
@@ -121,7 +124,7 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_accosiated_study_lines] = study_lines
         except:
             message = f"{file_name}, {course}: Error when splitting page_source"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape last updated
         try:
@@ -131,7 +134,7 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_last_updated] = last_updated
         except:
             message = f"{file_name}, {course}: Error when splitting page_source"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape General course objectives
         try:
@@ -141,7 +144,7 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_general_course_objectives] = course_objectives
         except:
             message = f"{file_name}, {course}: Error when splitting page_source"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape Learning objectives
         try:
@@ -151,7 +154,7 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_learning_objectives] = learning_objectives
         except:
             message = f"{file_name}, {course}: Error when splitting page_source"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape course content
         try:
@@ -161,7 +164,7 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_content] = course_content
         except:
             message = f"{file_name}, {course}: Error when splitting page_source"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
 
         # Scrape course remarks
         try:
@@ -176,11 +179,7 @@ def scrape_info(course_numbers, file_name):
             pass
 
         # Scrape course responsibles page source
-        try:
-            page_source_responsibles = get_course_responsible_page_source(course)
-        except:
-            message = f"{file_name}, {course}: Timeout when loading URL for course responsibles"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+        page_source_responsibles = get_course_responsible_page_source(driver, course)
 
         # Scrape main responsible
         try:
@@ -202,21 +201,57 @@ def scrape_info(course_numbers, file_name):
             df_row[DtuConsts.dtu_pic_of_co_responsible_4] = co_4_pic
         except:
             message = f"{file_name}, {course}: Error when scraping main responsible"
-            Utils.logger(message, "Error", FileNameConsts.scrape_log_name)
+            Utils.logger(message, "Error", FileNameConsts.scrape_log_name, course=course, stage=file_name)
+
+        return df_row
 
-        # Concatenate dict to dataframe as a new row
-        df = Utils.add_dict_to_df(df_row, lst_of_column_names, df)
+
+
+#%%
+
+    # Begin the webscrape and initialize the data frame
+    df_index = FileNameConsts.df_index
+    df_columns = {}
+    lst_of_column_names = [df_index] + InfoConsts.scrape_info_column_names
+    for column_name in lst_of_column_names:
+        df_columns[column_name] = []
+    df = pd.DataFrame(data = df_columns)
+    row_builder = DfRowBuilder(lst_of_column_names, df)
+    fetcher = HttpFetcher()
+    driver_pool = SeleniumDriverPool(pool_size)
+
+    journal = ScrapeJournal(file_name, resume)
+
+    # Loop through all courses, the pool returns the df rows in the same order as course_numbers
+    print('Webscrape of evaluations will now begin...')
+    iteration_count = 0
+    remaining_courses = [course for course in course_numbers if course not in journal]
+    scraped_rows = driver_pool.map(scrape_course, remaining_courses, file_name)
+    for course in course_numbers:
+        if course in journal:
+            df_row = journal.get_row(course)
+        else:
+            df_row = next(scraped_rows)
+            # Failed courses are not journaled, so they are retried when the scrape is resumed
+            if df_row is None:
+                df_row = {df_index: course}
+            else:
+                journal.append(df_row)
+
+        # Add dict to the row builder as a new row
+        row_builder.add_dict(df_row)
 
         # Print current course to console so user can track the progress
         iteration_count += 1
         Utils.print_progress(iteration_count, course_numbers, df_row, file_name)
+    journal.close()
+    df = row_builder.to_df()
 
     # Save all info as df
     Utils.save_scraped_df(df, file_name)
     Utils.save_df_as_csv(df, file_name)
+    journal.remove()
 
-    # End of program
-    driver.quit
     # Webscrape for all courses have been completed
     print()
     print('Webscrape of info is now completed! Check log for details.')
@@ -226,9 +261,14 @@ def scrape_info(course_numbers, file_name):
 
 #%%
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scrape course info for all DTU courses')
+    parser.add_argument('--resume', action='store_true', help='skip the courses completed by an interrupted run')
+    args = parser.parse_args()
+
     # Variables and initialization
     COURSE_NUMBERS = Utils.get_course_numbers()
     #COURSE_NUMBERS = ['01005', '01017']
 
     info_df_name = FileNameConsts.info_df
-    scrape_info(COURSE_NUMBERS, info_df_name)
+    scrape_info(COURSE_NUMBERS, info_df_name, resume=args.resume)
+    instrumentation.save_report('scrape_info')
@@ -0,0 +1,96 @@
+#%%
+
+# Imports
+import json
+import os
+# Helper functions and global constants
+from utils import Utils
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class ScrapeJournal:
+    """ Append-only journal of the df rows that a scraper has completed, one json line per course.
+        The journal is flushed to disk every flush_every rows, so an interrupted scrape can be
+        resumed without scraping the journaled courses again. A new journal replaces the old one at its first row,
+        and the journal is removed once the scraped df is saved, so a later resume never reuses rows of a finished run """
+
+    def __init__(self, file_name, resume=False, flush_every=Config.journal_flush_every):
+        folder_name = FileNameConsts.scraped_data_folder_name+'/'+FileNameConsts.journal_folder_name
+        Utils.create_folder(folder_name)
+        self.file_location = f'{folder_name}/{file_name}.jsonl'
+        self.flush_every = flush_every
+        self.resume = resume
+        self.rows = {}
+        if resume:
+            self.rows = self._read_rows()
+        self._unflushed_count = 0
+        self._file = None
+
+
+    def __contains__(self, course):
+        return course in self.rows
+
+
+    def get_row(self, course):
+        """Return the journaled df row of course"""
+        return self.rows[course]
+
+
+    def append(self, df_row):
+        """Add a completed df row to the journal"""
+        course = df_row[FileNameConsts.df_index]
+        self.rows[course] = df_row
+        if self._file is None:
+            self._file = open(self.file_location, 'a' if self.resume else 'w', encoding='utf-8')
+        self._file.write(json.dumps(df_row, default=self._to_json_value)+'\n')
+        self._unflushed_count += 1
+        if self._unflushed_count >= self.flush_every:
+            self.flush()
+
+
+    def flush(self):
+        """Force the journaled rows onto the disk"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed_count = 0
+
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+    def remove(self):
+        """Delete the journal, once the rows of a finished scrape have been saved"""
+        self.close()
+        if os.path.exists(self.file_location):
+            os.remove(self.file_location)
+
+
+    def _read_rows(self):
+        """Return the journaled rows by course. A line that was cut short by a crash is ignored"""
+        rows = {}
+        if not os.path.exists(self.file_location):
+            return rows
+        with open(self.file_location, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    df_row = json.loads(line)
+                except ValueError:
+                    continue
+                rows[df_row[FileNameConsts.df_index]] = df_row
+        message = f"Scrape journal: Resuming from {len(rows)} journaled courses in {self.file_location}"
+        Utils.logger(message, 'info', FileNameConsts.scrape_log_name)
+        return rows
+
+
+    def _to_json_value(self, value):
+        """Convert numpy scalars (as returned by pandas) to plain python values"""
+        if hasattr(value, 'item'):
+            return value.item()
+        raise TypeError(f'{type(value).__name__} is not JSON serializable')
@@ -0,0 +1,60 @@
+#%%
+
+# Imports
+import pandas as pd
+# Helper functions and global constants
+from instrumentation import instrumentation
+from utils import Utils
+from website.search_index import SEARCH_FIELDS, create_search_postings
+from website.global_constants.file_name_consts import FileNameConsts
+from website.global_constants.info_consts import InfoConsts
+from website.global_constants.website_consts import WebsiteConsts
+
+# Columns searched in each field of SEARCH_FIELDS
+SEARCH_COLUMNS = {'course': [FileNameConsts.df_index],
+                  'english_name': [InfoConsts.name_english],
+                  'danish_name': [InfoConsts.danish_name.key_df],
+                  'responsible': [InfoConsts.main_responsible_name.key_df, InfoConsts.co_responsible_1_name.key_df,
+                                  InfoConsts.co_responsible_2_name.key_df, InfoConsts.co_responsible_3_name.key_df,
+                                  InfoConsts.co_responsible_4_name.key_df]}
+
+
+def search_index_creator():
+    """ Create the search index used by the website's search field: the course numbers, in the order of the df,
+        and for each trigram of the searchable fields, a posting list of ordinal * len(SEARCH_FIELDS) + field """
+
+    # Load in data frame from pickle
+    name_and_path_of_pkl = FileNameConsts.path_of_pkl + FileNameConsts.name_of_pkl + ".pkl"
+    df = pd.read_pickle(name_and_path_of_pkl)
+
+    courses = df[FileNameConsts.df_index].tolist()
+    field_values = []
+    for field_name in SEARCH_FIELDS:
+        columns = [column for column in SEARCH_COLUMNS[field_name] if column in df]
+        if len(columns) != len(SEARCH_COLUMNS[field_name]):
+            message = f"Search index creator; some of {SEARCH_COLUMNS[field_name]} not found in df!"
+            Utils.logger(message, "warning", FileNameConsts.format_log_name)
+        # Missing values are NaN or NO_DATA
+        field_values.append([[value for value in row if isinstance(value, str) and value != InfoConsts.no_responsible]
+                             for row in df[columns].itertuples(index=False, name=None)])
+    postings = create_search_postings(field_values)
+    return {WebsiteConsts.json_number: courses, WebsiteConsts.search_trigrams: postings}
+
+
+@instrumentation.timed('search_index_to_json')
+def search_index_to_json():
+    """ Create and save the search index used by the website """
+    search_index = search_index_creator()
+
+    # save as JSON
+    json_name = WebsiteConsts.json_search_index
+    path_and_file_name = FileNameConsts.path_of_pkl + json_name + '.json'
+    if Utils.save_json_if_changed(path_and_file_name, search_index):
+        print(f"The dictionary {json_name}.json has been saved...")
+    else:
+        print(f"The dictionary {json_name}.json is unchanged...")
+
+
+#%%
+if __name__ == "__main__":
+    search_index_to_json()
@@ -0,0 +1,131 @@
+#%%
+
+# Imports
+import queue
+import threading
+from concurrent.futures import Future
+from selenium.common.exceptions import WebDriverException
+# Helper functions and global constants
+from utils import Utils
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+
+
+class LazyDriver:
+    """ Stand-in for a webdriver that only launches Chrome when it is used for the first time.
+        Scrapers that fetch most pages over http will then rarely start a browser at all """
+
+    def __init__(self, launch_function):
+        self._launch_function = launch_function
+        self._driver = None
+
+    def __getattr__(self, name):
+        if self._driver is None:
+            self._driver = self._launch_function()
+        return getattr(self._driver, name)
+
+    def is_launched(self):
+        return self._driver is not None
+
+    def quit(self):
+        """Quit the webdriver if it has been launched"""
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+class SeleniumDriverPool:
+    """ A pool of headless Chrome workers. Each worker thread owns a single driver and pulls
+        course numbers from a shared work queue, so the page loads (and their WebDriverWait
+        timeouts) of different courses overlap. Drivers are launched on first use, and a driver
+        that crashes is restarted automatically """
+
+    def __init__(self, pool_size=Config.selenium_pool_size, max_attempts=Config.selenium_max_attempts, headless=True):
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.headless = headless
+        self._launch_lock = threading.Lock()
+
+
+    def map(self, scrape_function, course_numbers, file_name):
+        """ Call scrape_function(driver, course) for each course and yield the results in the same
+            order as course_numbers. If a course fails max_attempts times, None is yielded instead """
+        work_queue = queue.Queue()
+        futures = []
+        for course in course_numbers:
+            future = Future()
+            futures.append(future)
+            work_queue.put((course, future))
+
+        # Start workers (never more workers than there are courses)
+        workers = []
+        for _ in range(0, min(self.pool_size, len(course_numbers))):
+            worker = threading.Thread(target=self._worker, args=(scrape_function, work_queue, file_name), daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        # Results are yielded in order, even though the workers finish them out of order
+        for future in futures:
+            yield future.result()
+        for worker in workers:
+            worker.join()
+
+
+    def _worker(self, scrape_function, work_queue, file_name):
+        """Scrape courses from the work queue until it is empty, then quit the driver"""
+        driver = LazyDriver(self._launch_driver)
+        while True:
+            try:
+                course, future = work_queue.get_nowait()
+            except queue.Empty:
+                break
+            result = None
+            for attempt in range(1, self.max_attempts+1):
+                try:
+                    result = scrape_function(driver, course)
+                    if self._is_alive(driver):
+                        break
+                    # The scrape function swallowed a crash, so its result can't be trusted
+                    message = f"{file_name}, {course}: Webdriver crashed (attempt {attempt} of {self.max_attempts})"
+                    Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name, course=course, stage=file_name)
+                except Exception as e:
+                    message = f"{file_name}, {course}: {type(e).__name__} (attempt {attempt} of {self.max_attempts})"
+                    Utils.logger(message, 'Warning', FileNameConsts.scrape_log_name, course=course, stage=file_name)
+                result = None
+                driver = self._restart_driver(driver)
+            if result is None:
+                message = f"{file_name}, {course}: Failed to scrape after {self.max_attempts} attempts"
+                Utils.logger(message, 'Error', FileNameConsts.scrape_log_name, course=course, stage=file_name)
+            future.set_result(result)
+        self._quit_driver(driver)
+
+
+    def _launch_driver(self):
+        """Launch a new driver. Launches are serialized, as ChromeDriverManager is not thread-safe"""
+        with self._launch_lock:
+            return Utils.launch_selenium(headless=self.headless)
+
+
+    def _restart_driver(self, driver):
+        """Quit the (possibly crashed) driver, a new one is launched when it is used again"""
+        self._quit_driver(driver)
+        return LazyDriver(self._launch_driver)
+
+
+    def _quit_driver(self, driver):
+        """Quit driver and ignore errors from drivers that have already crashed"""
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+
+    def _is_alive(self, driver):
+        """Return True if the driver still responds to commands (or was never launched)"""
+        if not driver.is_launched():
+            return True
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
@@ -1,9 +1,9 @@
 
 #%%
 # Imports
-import logging
 import os
 import json
+import numpy as np
 import pandas as pd
 from selenium import webdriver
 from webdriver_manager.chrome import ChromeDriverManager
@@ -15,6 +15,7 @@ from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support import expected_conditions as EC
 
 # Helper functions and global constants
+from pipeline_logging import LOG_TYPE_LEVELS, pipeline_logging
 from website.global_constants.config import Config
 from website.global_constants.file_name_consts import FileNameConsts
 
@@ -38,11 +39,13 @@ class Utils:
         return dct
 
 
-    def launch_selenium():
+    def launch_selenium(headless=False):
         """Initialize selenium webdriver and return driver"""
         options = Options()
         options.add_argument("--log-level=3")
         options.add_argument('--disable-logging')
+        if headless:
+            options.add_argument('--headless=new')
         driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
         #driver = webdriver.Chrome(PATH, options=options)
         return driver
@@ -134,19 +137,6 @@ class Utils:
         return dct
 
 
-    def add_dict_to_df(dct, lst_of_column_names, df):
-        "Add dict elements to df if dict keys matches column name"
-        df_input = {}
-        for element in lst_of_column_names:
-            if element in dct:
-                df_input[element] = [dct[element]]
-            else:
-                df_input[element] = [Config.data_null_value]
-        new_df_row = pd.DataFrame(data = df_input)
-        df = pd.concat([df, new_df_row], ignore_index=True)
-        return df
-
-
     def save_df_as_csv(file_name, df_index, df):
         "Save dataframe as csv file on harddisk in location specified by file_name"
         folder_name = FileNameConsts.scraped_data_folder_name
@@ -165,6 +155,21 @@ class Utils:
             json.dump(dct, fp)
 
 
+    def save_json_if_changed(file_location, dct):
+        """Save dictionary as JSON file in file_location, unless the file already contains exactly that. Return True if the file was written"""
+        content = json.dumps(dct)
+        if os.path.exists(file_location):
+            with open(file_location) as fp:
+                if fp.read() == content:
+                    return False
+        # Write to a temporary file first, so the website never reads a half written file
+        tmp_location = f'{file_location}.tmp'
+        with open(tmp_location, 'w') as fp:
+            fp.write(content)
+        os.replace(tmp_location, file_location)
+        return True
+
+
     def save_scraped_df(df, file_name):
         "Save dataframe as pkl file on harddisk in location specified by file_name"
         folder_name = FileNameConsts.scraped_data_folder_name
@@ -195,39 +200,94 @@ class Utils:
         return df
 
 
-    def logger(message, type = 'info', log_file_name = 'unspecified'):
-        """Log message in log file. Also prints message unless type is 'log'"""
-
-        if type.lower() != 'none':
-            Utils.create_folder(FileNameConsts.log_folder_name+'/'+log_file_name)
-            logging.basicConfig(filename=FileNameConsts.log_folder_name+'/'+log_file_name+'.log',
-                                format='(%(asctime)s) %(levelname)s: %(message)s',
-                                level=logging.INFO)
+    def logger(message, type = 'info', log_file_name = 'unspecified', **fields):
+        """ Log message in log file. Also prints message unless type is 'log'.
+            Structured fields (course, semester, stage) are added to the log record """
+        log_type = type.lower()
 
         # Print message to console (format varies based on 'type')
-        if type.lower() == 'info':
+        if log_type == 'info':
             print(message)
-        elif type.lower() == 'log':
-            pass
-        elif type.lower() == 'none':
+        elif log_type == 'log' or log_type == 'none':
             pass
         else:
             print(f'{type.capitalize()}: {message}')
 
         # Write message to log file (severity status based on 'type')
-        if type.lower() == 'debug':
-            logging.debug(message)
-        elif type.lower() == 'info' or type.lower() == 'log':
-            logging.info(message)
-        elif type.lower() == 'warning':
-            logging.warning(message)
-        elif type.lower() == 'error':
-            logging.error(message)
-        elif type.lower() == 'critical':
-            logging.critical(message)
-        elif type.lower() == 'print':
-            pass
-        elif type.lower() == 'none':
-            pass
+        if log_type == 'print' or log_type == 'none':
+            return
+        elif log_type in LOG_TYPE_LEVELS:
+            pipeline_logging.get_logger(log_file_name).log(LOG_TYPE_LEVELS[log_type], message, extra=fields)
         else:
-            logging.debug(f'{message} (INVALID LOG TYPE!)')
\ No newline at end of file
+            pipeline_logging.get_logger(log_file_name).debug(f'{message} (INVALID LOG TYPE!)', extra=fields)
+
+
+class DfRowBuilder:
+    """ Collect df rows column by column and materialize them as a single DataFrame at the end.
+        Concatenating one-row DataFrames in a loop copies the whole df for every new row instead """
+
+    def __init__(self, lst_of_column_names, empty_df=None):
+        self.lst_of_column_names = lst_of_column_names
+        self.empty_df = empty_df
+        self._columns = {column_name: [] for column_name in lst_of_column_names}
+
+
+    def __len__(self):
+        return len(self._columns[self.lst_of_column_names[0]])
+
+
+    def add_dict(self, dct):
+        "Add dict elements as a new row if dict keys matches column name"
+        for element in self.lst_of_column_names:
+            if element in dct:
+                self._columns[element].append(dct[element])
+            else:
+                self._columns[element].append(Config.data_null_value)
+
+
+    def to_df(self):
+        """Return the collected rows as a DataFrame, with the same dtypes and values as concatenating one row at a time"""
+        df_columns = {}
+        for column_name, values in self._columns.items():
+            df_columns[column_name] = self._concat_column(column_name, values)
+        return pd.DataFrame(data = df_columns)
+
+
+    def _concat_column(self, column_name, values):
+        """ Concatenate a column run by run, where a run is consecutive values of the same type (see _run_type). Concatenating row by row upcasts
+            as it goes (an int becomes a float when a float row is added, and stays a float if a string row is added later),
+            and concatenating runs gives exactly the same result with only a few concats per column """
+        column_df = None
+        if self.empty_df is not None:
+            column_df = self.empty_df[[column_name]]
+        i = 0
+        while i < len(values):
+            # Once a column is object, every following value is kept as it is (numpy scalars become python scalars)
+            if column_df is not None and column_df[column_name].dtype == object:
+                rest = [value.item() if isinstance(value, np.generic) else value for value in values[i:]]
+                rest_df = pd.DataFrame(data = {column_name: pd.Series(rest, dtype=object)})
+                column_df = pd.concat([column_df, rest_df], ignore_index=True)
+                break
+            # Ints and floats share a run, unless the column so far is neither int nor float (e.g. bool)
+            is_numeric = column_df is None or column_df[column_name].dtype.kind in 'iuf'
+            j = i + 1
+            while j < len(values) and self._run_type(values[j], is_numeric) is self._run_type(values[i], is_numeric):
+                j += 1
+            run_df = pd.DataFrame(data = {column_name: values[i:j]})
+            if column_df is None:
+                column_df = run_df
+            else:
+                column_df = pd.concat([column_df, run_df], ignore_index=True)
+            i = j
+        if column_df is None:
+            return pd.Series(values, dtype=object)
+        return column_df[column_name]
+
+
+    @staticmethod
+    def _run_type(value, is_numeric):
+        """ Return the type that decides which run value belongs to. Added to an int or float column, a mix of ints and floats
+            becomes a float column no matter the order, so they can share a run """
+        if is_numeric and isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)):
+            return float
+        return type(value)
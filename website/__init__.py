@@ -1,25 +1,56 @@
-
-
 # Imports
+import importlib
+import sys
+import time
+import_start = time.perf_counter()
 from flask import Flask
 # Helper functions and global constants
+from website.global_constants.config import Config
+flask_import_time = time.perf_counter() - import_start
+
+# Blueprints are registered in this order, each blueprint module has a Blueprint with the same name
+BLUEPRINTS = ['views', 'misc', 'browse', 'course_database', 'search']
 
 
-def create_app():
+def create_app(profile_startup=Config.website_profile_startup):
+    """ Create the website. With profile_startup, the time spent importing and initializing each part
+        of the website is printed, so slow startup (e.g. heavy imports in a blueprint) can be found """
+    timings = [('import flask', flask_import_time)]
+    step_start = time.perf_counter()
+    def time_step(step_name):
+        nonlocal step_start
+        step_end = time.perf_counter()
+        timings.append((step_name, step_end - step_start))
+        step_start = step_end
+
     app = Flask(__name__)
     app.static_folder = 'static'
     app.config['SECRET_KEY'] = 'cookiecutter24470763'
-
-    from .views import views
-    app.register_blueprint(views, url_prefix='/')
-
-    from .misc import misc
-    app.register_blueprint(misc, url_prefix='/')
-
-    from .browse import browse
-    app.register_blueprint(browse, url_prefix='/')
-
-    from .course_database import course_database
-    app.register_blueprint(course_database, url_prefix='/')
-
-    return app
\ No newline at end of file
+    time_step('create flask app')
+
+    # Parse the json dictionaries and open the course records once, requests are then served from memory
+    from .data_store import data_store
+    time_step('import data_store')
+    data_store.load()
+    time_step('load json dictionaries')
+    data_store.load_course_records()
+    time_step('load course records')
+
+    for blueprint_name in BLUEPRINTS:
+        blueprint_module = importlib.import_module(f'.{blueprint_name}', __name__)
+        time_step(f'import {blueprint_name}')
+        app.register_blueprint(getattr(blueprint_module, blueprint_name), url_prefix='/')
+        time_step(f'register {blueprint_name}')
+
+    if profile_startup:
+        print_startup_profile(timings)
+    return app
+
+
+def print_startup_profile(timings):
+    """Print the time of each startup step, and the total time since the website package was imported"""
+    print("Startup profile:")
+    for step_name, step_time in timings:
+        print(f"  {step_name:<28}{step_time * 1000:>9.1f} ms")
+    print(f"  {'total':<28}{(time.perf_counter() - import_start) * 1000:>9.1f} ms")
+    print(f"  pandas imported: {'pandas' in sys.modules}")
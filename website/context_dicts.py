@@ -1,72 +1,27 @@
 
 
 # Imports
-import json
 # Helper functions and global constants
+from website.data_store import data_store
+from website.filter_index import filter_index
 from website.global_constants.website_consts import WebsiteConsts
-from website.global_constants.file_name_consts import FileNameConsts
 
 
 def load_dct_from_json_file(file_name):
-    """Load in dictionary from json file"""
-    dct_name = FileNameConsts.path_of_pkl + file_name + '.json'
-    try:
-        with open(dct_name) as f:
-            dct = json.load(f)
-        return dct
-    except: # return empty dict if no file found
-        print(f"Error: Dictionary with file name {file_name} was not found in {FileNameConsts.path_of_pkl}")
-        return {}
+    """Return dictionary from json file (parsed once and kept in memory by data_store, so do not modify it)"""
+    return data_store.get(file_name)
 
 def create_filtered_list_from_url_args(url_args):
-    filter_dct = get_filter_dct()
-    temp_dct = {}
-    for value in url_args:
-        catagory = url_args[value]
-        if (catagory in filter_dct) and (value in filter_dct[catagory]):
-            if catagory in temp_dct:
-                temp_dct[catagory] += filter_dct[catagory][value]
-            else:
-                temp_dct[catagory] = filter_dct[catagory][value]
-    courses_to_display = set()
-    is_first_iteration = True
-    for key in temp_dct:
-        if is_first_iteration:
-            is_first_iteration = False
-            courses_to_display = set(temp_dct[key])
-        else:
-            courses_to_display = courses_to_display.intersection(temp_dct[key])
-    return courses_to_display
+    """Return set of courses matching the filters in url_args"""
+    return filter_index.filter_course_set(url_args)
 
 def turn_set_into_lst_and_sort(set_of_courses_to_display, url_args):
+    """Return set of courses as a list, sorted by the sort_by url arg"""
+    return filter_index.sort_courses(set_of_courses_to_display, url_args)
 
-    def get_arranged_lst(arrange_order, set):
-        lst = []
-        for course in arrange_order:
-            if course in set:
-                lst.append(course)
-        return lst
-
-    sort_by = WebsiteConsts.sort_by
-    sorting_keys_as_dct = WebsiteConsts.json_as_sort_catagory
-    sorting_keys = list(sorting_keys_as_dct)
-    if (sort_by not in url_args) or (url_args[sort_by] not in sorting_keys):
-        # Invalid url args
-        arrange_order = list(courses().values())
-        #print(f'not in: {arrange_order}')
-        return get_arranged_lst(arrange_order, set_of_courses_to_display)
-    else:
-        # Valid url args
-        sorting_catagory = url_args[sort_by]
-        json_file_name = sorting_catagory
-        dct = load_dct_from_json_file(json_file_name)
-        arrange_order = list(dct)
-        if (sorting_catagory in sorting_keys):
-            if (sorting_keys_as_dct[sorting_catagory]): #Boolean, decides if list should be reversed
-                arrange_order.reverse()
-        else:
-            print(f'Alert: {sorting_catagory} not in {sorting_keys}')
-        return get_arranged_lst(arrange_order, set_of_courses_to_display)
+def create_sorted_list_from_url_args(url_args):
+    """Return list of courses matching the filters in url_args, sorted by the sort_by url arg"""
+    return filter_index.filter_courses(url_args)
 
 def dicts_to_display():
     return {'list_of_dicts': ['2.5 ECTS or fewer ECTS points:',
@@ -143,31 +98,12 @@ def current_args(url_args):
     return {WebsiteConsts.url_arg_key: args_without_sort_by, WebsiteConsts.sort_by: current_sort_by}
 
 def summary_stats(course_lst):
+    """Return average rating, workload, grade etc. of the courses in course_lst"""
+    return filter_index.summary_stats_of_courses(course_lst)
 
-    def calculate_average(json_dct, decimal_places):
-        value_count = 0
-        total_value = 0
-        average_value = 0
-        for course in course_lst:
-            if (json_dct[course] != 0) and ((type(json_dct[course]) == int) or (type(json_dct[course]) == float)):
-                value_count += 1
-                total_value += json_dct[course]
-        if value_count != 0:
-            average_value = round((total_value / value_count), decimal_places)
-            if decimal_places == 0:
-                average_value = int(average_value)
-
-        return average_value
-
-    stat_dct = {"rating": calculate_average(rating(), 2),
-                "workload": calculate_average(workload(), 2),
-                "learning": calculate_average(eval_learning(), 2),
-                "motivation": calculate_average(eval_motivation(), 2),
-                "feedback": calculate_average(eval_feedback(), 2),
-                "grade": calculate_average(grade(), 1),
-                "failrate": calculate_average(fail(), 1),
-                "signups": calculate_average(signups(), 0)}
-    return stat_dct
+def summary_stats_from_url_args(url_args):
+    """Return average rating, workload, grade etc. of the courses matching the filters in url_args (cached)"""
+    return filter_index.summary_stats(url_args)
 
 
 def courses():
@@ -0,0 +1,160 @@
+
+# Imports
+import json
+import os
+import numpy as np
+# Helper functions and global constants
+from website.global_constants.file_name_consts import FileNameConsts
+from website.global_constants.info_consts import InfoConsts
+
+# These columns are lists that were turned into strings by the csv, they are split into lists again
+RESPONSIBLE_COURSES_COLUMNS = [InfoConsts.main_responsible_courses, InfoConsts.co_responsible_1_courses, InfoConsts.co_responsible_2_courses,
+                               InfoConsts.co_responsible_3_courses, InfoConsts.co_responsible_4_courses]
+TABLE_LOCATION = FileNameConsts.path_of_pkl + FileNameConsts.course_table_name + ".bin"
+
+
+def create_course_records(df):
+    """ Return {course: record}, where each record is the ready to render data of a course page
+        (the same dict as df.loc[course].to_dict(), with the responsible courses as lists) """
+    records = {}
+    columns = list(df.columns)
+    for course, row in zip(df.index, df.itertuples(index=False, name=None)):
+        record = dict(zip(columns, row))
+        for column in RESPONSIBLE_COURSES_COLUMNS:
+            record[column] = list(record[column].split("<br />"))
+        records[course] = record
+    return records
+
+
+class CourseTable:
+    """ Course records stored column by column in one read-only memory-mapped file, so every web worker
+        shares the same pages of the OS page cache instead of holding its own copy of the records.
+
+        File layout: MAGIC, the header length (uint64), a json header, and the arrays, each aligned to 8 bytes.
+        The header has the courses (in row order) and, for each column, the location of its arrays:
+            types:   uint8 type code of each cell (TYPE_CODES)
+            ints:    int64 value of each int and bool cell
+            floats:  float64 value of each float cell
+            offsets: int64 start of each string cell in blob (and the end of the last one)
+            blob:    utf-8 text of the string and list cells (lists are joined by LIST_SEPARATOR)
+        Columns only have the arrays their cells use. A record is decoded from its row when it is looked up """
+
+    MAGIC = b'CTABLE01'
+    LIST_SEPARATOR = "<br />" # Lists were made by splitting on this, so joining them again gives the same list
+    TYPE_CODES = {type(None): 0, bool: 1, int: 2, float: 3, str: 4, list: 5}
+
+    def __init__(self, file_location=TABLE_LOCATION):
+        buffer = np.memmap(file_location, dtype=np.uint8, mode='r')
+        if bytes(buffer[:len(self.MAGIC)]) != self.MAGIC:
+            raise ValueError(f"{file_location} is not a course table")
+        header_start = len(self.MAGIC) + 8
+        header_length = int(buffer[len(self.MAGIC):header_start].view('<u8')[0])
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]).decode('utf-8'))
+
+        self.courses = header['courses']
+        self.rows = {self.courses[i]: i for i in range (0, len(self.courses))}
+        self.columns = []
+        for column in header['columns']:
+            arrays = {}
+            for array_name, (offset, dtype, length) in column['arrays'].items():
+                arrays[array_name] = buffer[offset:offset + length * np.dtype(dtype).itemsize].view(dtype)
+            self.columns.append((column['name'], arrays))
+
+
+    def __len__(self):
+        return len(self.courses)
+
+
+    def __iter__(self):
+        return iter(self.courses)
+
+
+    def __contains__(self, course):
+        return course in self.rows
+
+
+    def __getitem__(self, course):
+        """Return the record of course, with the same values (and types) as the record it was saved from"""
+        row = self.rows[course]
+        record = {}
+        for column_name, arrays in self.columns:
+            type_code = arrays['types'][row]
+            if type_code == 0:
+                value = None
+            elif type_code == 1:
+                value = bool(arrays['ints'][row])
+            elif type_code == 2:
+                value = int(arrays['ints'][row])
+            elif type_code == 3:
+                value = float(arrays['floats'][row])
+            else:
+                value = bytes(arrays['blob'][arrays['offsets'][row]:arrays['offsets'][row + 1]]).decode('utf-8')
+                if type_code == 5:
+                    value = value.split(self.LIST_SEPARATOR)
+            record[column_name] = value
+        return record
+
+
+    @classmethod
+    def save(cls, records, file_location=TABLE_LOCATION):
+        """Save {course: record} as a course table, replacing the previous file all at once"""
+        courses = list(records)
+        column_names = list(records[courses[0]]) if courses else []
+        arrays = [] # (column name, array name, array)
+        for column_name in column_names:
+            values = [records[course][column_name] for course in courses]
+            types = np.array([cls.TYPE_CODES[type(value)] for value in values], dtype=np.uint8)
+            arrays.append((column_name, 'types', types))
+            if np.isin(types, [1, 2]).any():
+                arrays.append((column_name, 'ints', np.array([value if type(value) in (bool, int) else 0 for value in values], dtype=np.int64)))
+            if (types == 3).any():
+                arrays.append((column_name, 'floats', np.array([value if type(value) == float else 0.0 for value in values], dtype=np.float64)))
+            if (types >= 4).any():
+                texts = []
+                for value in values:
+                    if type(value) == str:
+                        texts.append(value.encode('utf-8'))
+                    elif type(value) == list:
+                        texts.append(cls.LIST_SEPARATOR.join(value).encode('utf-8'))
+                    else:
+                        texts.append(b'')
+                offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(text) for text in texts])
+                arrays.append((column_name, 'offsets', offsets))
+                arrays.append((column_name, 'blob', np.frombuffer(b''.join(texts), dtype=np.uint8)))
+
+        # The array offsets depend on the header length, so the header is made again until it fits in header_length
+        header_length = 0
+        while True:
+            offset = cls._aligned(len(cls.MAGIC) + 8 + header_length)
+            header_columns = {column_name: {'name': column_name, 'arrays': {}} for column_name in column_names}
+            for column_name, array_name, array in arrays:
+                header_columns[column_name]['arrays'][array_name] = [offset, array.dtype.str, len(array)]
+                offset = cls._aligned(offset + array.nbytes)
+            header = json.dumps({'courses': courses, 'columns': list(header_columns.values())}).encode('utf-8')
+            if len(header) <= header_length:
+                header = header.ljust(header_length) # json allows trailing whitespace
+                break
+            header_length = len(header)
+
+        tmp_location = f'{file_location}.tmp'
+        with open(tmp_location, 'wb') as f:
+            f.write(cls.MAGIC)
+            f.write(np.array([header_length], dtype='<u8').tobytes())
+            f.write(header)
+            for column_name, array_name, array in arrays:
+                f.write(b'\0' * (cls._aligned(f.tell()) - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_location, file_location)
+
+
+    @staticmethod
+    def _aligned(offset):
+        return (offset + 7) // 8 * 8
+
+
+def load_course_records(file_location=TABLE_LOCATION):
+    """Open the course table made by the build. The website never builds it itself, as that would import pandas"""
+    if not os.path.exists(file_location):
+        raise FileNotFoundError(f"{file_location} was not found, run the build (python csv_creator.py) to create the course table")
+    return CourseTable(file_location)
@@ -0,0 +1,133 @@
+
+# Imports
+import json
+import os
+import threading
+import time
+# Helper functions and global constants
+from website.global_constants.config import Config
+from website.global_constants.file_name_consts import FileNameConsts
+from website.global_constants.website_consts import WebsiteConsts
+
+
+class DataStore:
+    """ The website's json dictionaries, parsed once and kept in memory, and the course records.
+        At most once every reload_interval seconds, the json files and the course table are checked for changes
+        (mtime and size), and the files that have been published again by the build pipeline are reloaded.
+        The dictionaries are shared between requests and must not be modified """
+
+    def __init__(self, folder_name=FileNameConsts.path_of_pkl, reload_interval=Config.website_reload_interval):
+        self.folder_name = folder_name
+        self.reload_interval = reload_interval
+        self.version = 0 # Incremented whenever a file is (re)loaded
+        self.course_records = {} # {course: data of course page}, see load_course_records
+        self.course_numbers = () # For picking random courses in O(1)
+        self._dcts = {}
+        self._file_stats = {}
+        self._course_table_stat = None # None until the course records are loaded
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+
+    def load(self, file_names=None):
+        """Load file_names (all of the website's json files by default) from disk"""
+        if file_names is None:
+            file_names = list(WebsiteConsts.json_as_sort_catagory) + [WebsiteConsts.json_filter_dct, WebsiteConsts.json_sort_ranks, WebsiteConsts.json_search_index]
+        with self._lock:
+            for file_name in file_names:
+                self._load_file(file_name)
+            self._next_check = time.monotonic() + self.reload_interval
+
+
+    def load_course_records(self):
+        """Open the course records made by the build"""
+        with self._lock:
+            self._load_course_records()
+
+
+    def get(self, file_name):
+        """Return the dictionary stored in json file file_name, or an empty dict if there is no such file"""
+        self.reload_if_changed()
+        if file_name not in self._dcts:
+            with self._lock:
+                if file_name not in self._dcts:
+                    self._load_file(file_name)
+        return self._dcts[file_name]
+
+
+    def reload_if_changed(self):
+        """Reload the files that have changed on disk, but check no more than once every reload_interval seconds"""
+        if time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            for file_name in list(self._dcts):
+                if self._file_stat(file_name) != self._file_stats[file_name]:
+                    self._load_file(file_name)
+            if self._course_table_stat is not None and self._stat(self._course_table_location()) != self._course_table_stat:
+                self._load_course_records()
+            self._next_check = time.monotonic() + self.reload_interval
+
+
+    def _file_location(self, file_name):
+        return self.folder_name + file_name + '.json'
+
+
+    def _course_table_location(self):
+        return self.folder_name + FileNameConsts.course_table_name + '.bin'
+
+
+    def _file_stat(self, file_name):
+        return self._stat(self._file_location(file_name))
+
+
+    def _stat(self, file_location):
+        try:
+            stat = os.stat(file_location)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+    def _load_course_records(self):
+        """Open the course table and replace the course records (the lock must be held)"""
+        from .course_records import load_course_records # Imports numpy, so only when the records are loaded
+        file_location = self._course_table_location()
+        file_stat = self._stat(file_location)
+        try:
+            course_records = load_course_records(file_location)
+        except (OSError, ValueError):
+            if self._course_table_stat is None:
+                raise
+            # Keep serving the previous version, the table is checked again at the next reload
+            print(f"Error: Course table {file_location} could not be reloaded")
+            self._course_table_stat = file_stat or self._course_table_stat
+            return
+        self.course_records = course_records
+        self.course_numbers = tuple(course_records)
+        self._course_table_stat = file_stat
+        self.version += 1
+
+
+    def _load_file(self, file_name):
+        """Parse file_name and replace the stored dict (the lock must be held)"""
+        file_stat = self._file_stat(file_name)
+        try:
+            with open(self._file_location(file_name)) as f:
+                dct = json.load(f)
+        except (OSError, ValueError):
+            if file_name in self._dcts:
+                # Keep serving the previous version, e.g. if the file is being written right now
+                print(f"Error: Dictionary with file name {file_name} could not be reloaded from {self.folder_name}")
+                self._file_stats[file_name] = file_stat
+                return
+            # use empty dict if no file found
+            print(f"Error: Dictionary with file name {file_name} was not found in {self.folder_name}")
+            dct = {}
+        self._dcts[file_name] = dct
+        self._file_stats[file_name] = file_stat
+        self.version += 1
+
+
+data_store = DataStore()
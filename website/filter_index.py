@@ -0,0 +1,232 @@
+
+# Imports
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+# Helper functions and global constants
+from website.data_store import data_store
+from website.global_constants.config import Config
+from website.global_constants.website_consts import WebsiteConsts
+
+
+class FilterIndex:
+    """ Filter and sort index for the browse page, built from the json dictionaries in data_store.
+        Every course has a fixed ordinal (its position in the course numbers json), and every filter value
+        is a bool array over the ordinals. Filters are OR'ed within a category and AND'ed across categories.
+        Each sort category has an ascending and a descending rank array over the ordinals (made by the build),
+        so a filtered selection of k courses is sorted with an argsort of k ranks.
+        Each summary stat is a float array with a validity mask, and the stats of recent filter
+        combinations are kept in an LRU cache. The index is rebuilt whenever data_store has reloaded a file """
+
+    # Summary stats on the browse page: stat name, json and decimal places
+    SUMMARY_STATS = [("rating", WebsiteConsts.json_course_rating, 2),
+                     ("workload", WebsiteConsts.json_course_workload, 2),
+                     ("learning", WebsiteConsts.json_course_eval_learning, 2),
+                     ("motivation", WebsiteConsts.json_course_eval_motivation, 2),
+                     ("feedback", WebsiteConsts.json_course_eval_feedback, 2),
+                     ("grade", WebsiteConsts.json_course_grade, 1),
+                     ("failrate", WebsiteConsts.json_course_fail, 1),
+                     ("signups", WebsiteConsts.json_course_signups, 0)]
+
+    def __init__(self, store=data_store, stats_cache_size=Config.website_stats_cache_size):
+        self.store = store
+        self.stats_cache_size = stats_cache_size
+        self._index = None
+        self._lock = threading.Lock()
+        self._stats_cache = OrderedDict()
+        self._stats_cache_lock = threading.Lock()
+
+
+    def filter_courses(self, url_args):
+        """Return list of the courses matching the filters in url_args, sorted by the sort_by url arg"""
+        index = self._current_index()
+        return self._sorted_courses(index, self._filter_mask(index, url_args), url_args)
+
+
+    def filter_course_set(self, url_args):
+        """Return set of the courses matching the filters in url_args"""
+        index = self._current_index()
+        return set(index['courses'][self._filter_mask(index, url_args)].tolist())
+
+
+    def sort_courses(self, courses, url_args):
+        """Return the given courses as a list, sorted by the sort_by url arg"""
+        index = self._current_index()
+        mask = np.zeros(len(index['courses']), dtype=bool)
+        mask[[index['ordinals'][course] for course in courses if course in index['ordinals']]] = True
+        return self._sorted_courses(index, mask, url_args)
+
+
+    def summary_stats(self, url_args):
+        """ Return the summary stats of the courses matching the filters in url_args.
+            Filter combinations are cached by their valid filters, so sort_by or the order of url args does not matter """
+        index = self._current_index()
+        cache_key = (index['version'], self._canonical_filters(index, url_args))
+        with self._stats_cache_lock:
+            if cache_key in self._stats_cache:
+                self._stats_cache.move_to_end(cache_key)
+                return self._stats_cache[cache_key]
+        stat_dct = self._summary_stats_of_mask(index, self._filter_mask(index, url_args))
+        with self._stats_cache_lock:
+            self._stats_cache[cache_key] = stat_dct
+            while len(self._stats_cache) > self.stats_cache_size:
+                self._stats_cache.popitem(last=False)
+        return stat_dct
+
+
+    def summary_stats_of_courses(self, courses):
+        """Return the summary stats of the given courses (not cached)"""
+        index = self._current_index()
+        mask = np.zeros(len(index['courses']), dtype=bool)
+        mask[[index['ordinals'][course] for course in courses if course in index['ordinals']]] = True
+        return self._summary_stats_of_mask(index, mask)
+
+
+    def _summary_stats_of_mask(self, index, mask):
+        """ Average each summary stat over the courses in mask. Only numeric values other than 0 count,
+            and the average is 0 if no course has such a value """
+        stat_dct = {}
+        for stat_name, json_name, decimal_places in self.SUMMARY_STATS:
+            values, is_valid = index['stats'][stat_name]
+            selected = mask & is_valid
+            value_count = int(np.count_nonzero(selected))
+            average_value = 0
+            if value_count != 0:
+                # fsum is exact, so the average does not depend on the order of the courses
+                average_value = round(math.fsum(values[selected].tolist()) / value_count, decimal_places)
+                if decimal_places == 0:
+                    average_value = int(average_value)
+            stat_dct[stat_name] = average_value
+        return stat_dct
+
+
+    def _canonical_filters(self, index, url_args):
+        """Return the valid filters in url_args as a sorted tuple of (catagory, value)"""
+        filter_masks = index['filter_masks']
+        filters = set()
+        for value in url_args:
+            catagory = url_args[value]
+            if (catagory in filter_masks) and (value in filter_masks[catagory]):
+                filters.add((catagory, value))
+        return tuple(sorted(filters))
+
+
+    def _filter_mask(self, index, url_args):
+        """Return bool array of the courses matching the filters in url_args (no valid filter matches no courses)"""
+        filter_masks = index['filter_masks']
+        catagory_masks = {}
+        for value in url_args:
+            catagory = url_args[value]
+            if (catagory in filter_masks) and (value in filter_masks[catagory]):
+                if catagory in catagory_masks:
+                    catagory_masks[catagory] = catagory_masks[catagory] | filter_masks[catagory][value]
+                else:
+                    catagory_masks[catagory] = filter_masks[catagory][value]
+        mask = np.zeros(len(index['courses']), dtype=bool)
+        is_first_iteration = True
+        for catagory in catagory_masks:
+            if is_first_iteration:
+                is_first_iteration = False
+                mask = catagory_masks[catagory]
+            else:
+                mask = mask & catagory_masks[catagory]
+        return mask
+
+
+    def _sorted_courses(self, index, mask, url_args):
+        """Return the courses in mask as a list, in the order given by the sort_by url arg"""
+        sort_by = WebsiteConsts.sort_by
+        sorting_keys_as_dct = WebsiteConsts.json_as_sort_catagory
+        ordinals = np.flatnonzero(mask)
+        if (sort_by in url_args) and (url_args[sort_by] in sorting_keys_as_dct):
+            # Valid url args, otherwise the order of the course numbers json is used
+            if sorting_keys_as_dct[url_args[sort_by]]: #Boolean, decides if list should be reversed
+                ranks = index['ranks'][url_args[sort_by]][WebsiteConsts.descending][ordinals]
+            else:
+                ranks = index['ranks'][url_args[sort_by]][WebsiteConsts.ascending][ordinals]
+            # Courses without a rank (-1) are not in the sort category
+            is_ranked = ranks >= 0
+            ordinals = ordinals[is_ranked][np.argsort(ranks[is_ranked])]
+        return index['courses'][ordinals].tolist()
+
+
+    def _current_index(self):
+        """Return the index, after rebuilding it if data_store has reloaded any files"""
+        self.store.reload_if_changed()
+        index = self._index
+        if index is None or index['version'] != self.store.version:
+            with self._lock:
+                if self._index is None or self._index['version'] != self.store.version:
+                    self._index = self._build()
+                index = self._index
+        return index
+
+
+    def _build(self):
+        """Build course ordinals, filter masks and sort ranks from the current json dictionaries"""
+        version = self.store.version
+        courses = list(self.store.get(WebsiteConsts.json_number).values())
+        ordinals = {courses[i]: i for i in range (0, len(courses))}
+
+        # A bool array for each value in each filter category
+        filter_masks = {}
+        filter_dct = self.store.get(WebsiteConsts.json_filter_dct)
+        for catagory in filter_dct:
+            filter_masks[catagory] = {}
+            for value in filter_dct[catagory]:
+                mask = np.zeros(len(courses), dtype=bool)
+                mask[[ordinals[course] for course in filter_dct[catagory][value] if course in ordinals]] = True
+                filter_masks[catagory][value] = mask
+
+        # Rank arrays for each sort category, made by the build. If they are missing, or do not
+        # belong to the current course numbers json (e.g. while files are being published), make them here
+        sort_ranks = self.store.get(WebsiteConsts.json_sort_ranks)
+        has_all_ranks = all(sorting_catagory in sort_ranks.get(WebsiteConsts.json_sort_ranks, {}) for sorting_catagory in WebsiteConsts.json_as_sort_catagory)
+        if sort_ranks.get(WebsiteConsts.json_number) != courses or not has_all_ranks:
+            sort_ranks = {WebsiteConsts.json_sort_ranks: {}}
+            for sorting_catagory in WebsiteConsts.json_as_sort_catagory:
+                sort_ranks[WebsiteConsts.json_sort_ranks][sorting_catagory] = self._ranks_from_sort_json(sorting_catagory, ordinals)
+        ranks = {}
+        for sorting_catagory in WebsiteConsts.json_as_sort_catagory:
+            ranks[sorting_catagory] = {}
+            for direction in [WebsiteConsts.ascending, WebsiteConsts.descending]:
+                ranks[sorting_catagory][direction] = np.array(sort_ranks[WebsiteConsts.json_sort_ranks][sorting_catagory][direction], dtype=np.int32)
+
+        # Summary stats as float arrays, valid where the json value is a number other than 0 (not a string like "P/F")
+        stats = {}
+        for stat_name, json_name, decimal_places in self.SUMMARY_STATS:
+            stat_dct = self.store.get(json_name)
+            values = np.zeros(len(courses))
+            is_valid = np.zeros(len(courses), dtype=bool)
+            for i in range (0, len(courses)):
+                value = stat_dct.get(courses[i])
+                if (type(value) == int or type(value) == float) and value != 0:
+                    values[i] = value
+                    is_valid[i] = True
+            stats[stat_name] = (values, is_valid)
+
+        return {'version': version,
+                'courses': np.array(courses, dtype=object),
+                'ordinals': ordinals,
+                'filter_masks': filter_masks,
+                'ranks': ranks,
+                'stats': stats}
+
+
+    def _ranks_from_sort_json(self, sorting_catagory, ordinals):
+        """Return ascending and descending ranks of the courses in the sort json, like the build does (see csv_creator)"""
+        if sorting_catagory == WebsiteConsts.json_number:
+            # The course numbers json is {index: course}, the others are {course: value}
+            sort_order = list(ordinals)
+        else:
+            sort_order = [course for course in self.store.get(sorting_catagory) if course in ordinals]
+        ascending = [-1] * len(ordinals)
+        descending = [-1] * len(ordinals)
+        for rank in range (0, len(sort_order)):
+            ascending[ordinals[sort_order[rank]]] = rank
+            descending[ordinals[sort_order[rank]]] = len(sort_order) - 1 - rank
+        return {WebsiteConsts.ascending: ascending, WebsiteConsts.descending: descending}
+
+
+filter_index = FilterIndex()
@@ -1,8 +1,72 @@
 
-
 class Config:
     course_semesters = ['F18', 'E18', 'F19', 'E19', 'F20', 'E20', 'F21', 'E21', 'F22']
     course_years = '2022-2023/'
     data_null_value = None
     data_decimal_precision = 2
-    data_percental_precision = 1
\ No newline at end of file
+    data_percental_precision = 1
+
+    # Webscrape concurrency
+    scrape_max_workers = 16
+    scrape_requests_per_second = 20 # Per host, use 0 to disable the rate limit
+    selenium_pool_size = 4
+    selenium_max_attempts = 3
+    journal_flush_every = 10 # Completed courses between each checkpoint
+
+    # Data sources
+    source_grades = 'grades'
+    source_info = 'info'
+    source_responsible = 'responsible'
+    source_evaluations = 'evaluations'
+    source_evaluation_search = 'evaluation_search'
+    source_course_numbers = 'course_numbers'
+
+    # Base url of each DTU site. A local replay server (see replay_server.py) can stand in for all of them
+    grades_base_url = 'https://karakterer.dtu.dk'
+    info_base_url = 'https://kurser.dtu.dk' # Course info, course responsibles and the course number search
+    evaluations_base_url = 'https://evaluering.dtu.dk'
+
+    # Fetch mode per data source: 'http' downloads the server html directly, 'selenium' renders it in Chrome.
+    # An http page that lacks its validation marker is fetched again with selenium.
+    # The evaluation search (source_evaluation_search) can only be 'http' when the evaluations come from a replay server
+    fetch_modes = {source_info: 'http',
+                   source_responsible: 'http',
+                   source_course_numbers: 'http'}
+    fetch_validation_markers = {source_info: 'name="viewport"',
+                                source_responsible: 'name="viewport"',
+                                source_course_numbers: '<a href="/course/'}
+    http_timeout = 10
+
+    # Raw html cache. Days before a cached page must be revalidated, None means it never expires
+    cache_enabled = True
+    cache_ttl_days = {source_grades: None, # Grades never change once they are published
+                      source_evaluations: None, # Neither do evaluations
+                      source_evaluation_search: 30, # New evaluations are added every semester
+                      source_info: 365, # Info pages change once a year
+                      source_responsible: 365,
+                      source_course_numbers: 1}
+    cache_ttl_days_missing = 7 # Pages that did not exist (404) might be published later
+
+    # Logging
+    log_level = 'INFO' # Records below this level are not written to the log files
+
+    # Benchmarks
+    benchmark_scales = [1, 10] # Sizes of the synthetic catalogues, as multiples of the scraped courses (100 also works, but a full build then takes long)
+    benchmark_repeats = 3 # Runs of each benchmark case, the median run is compared with the baseline
+    benchmark_tolerance = 0.25 # A case is a regression if its median is this much slower than the baseline
+    load_test_requests = 2000 # Requests sent to the website by each load test driver
+    load_test_concurrency = 4 # Clients sending requests at the same time to the local wsgi server
+    replay_latency = 0.05 # Seconds the replay server waits before each response, like a real server
+    replay_jitter = 0.02 # Largest random deviation from replay_latency, in seconds
+    replay_error_rate = 0 # Share of replayed requests answered with 500 Internal Server Error
+    replay_not_found_rate = 0 # Share of replayed requests answered with 404 Not Found
+
+    # Website
+    website_reload_interval = 2 # Seconds between checks for newly published json files, use 0 to check on every request
+    website_stats_cache_size = 1024 # Filter combinations whose browse summary stats are kept in memory
+    website_page_cache_bytes = 64 * 1024 * 1024 # Total size of the rendered pages each worker keeps in memory
+    website_page_cache_page_bytes = 8 * 1024 * 1024 # Larger pages are rendered on every request instead of cached
+    website_profile_startup = False # Print the time spent importing and initializing each part of the website
+    search_result_limit = 10 # Courses suggested while typing in the search field
+    search_min_score = 0.6 # Share of the search's trigrams a course must match, lower values allow more typos
+    search_min_trigrams = 3 # Trigrams a submitted search needs before it goes straight to the best course, i.e. 3 letters
@@ -3,6 +3,9 @@
 class FileNameConsts:
     # General
     scraped_data_folder_name = "scraped_data"
+    html_cache_folder_name = "html_cache"
+    journal_folder_name = "journals"
+    format_cache_name = "format_cache"
     course_number_json = "course_numbers"
     df_index = 'COURSE'
     df_name = 'NAME'
@@ -25,4 +28,5 @@ class FileNameConsts:
     # PKL
     path_of_pkl = "website/static/pandas_df/"
     name_of_pkl = "course_df"
+    course_table_name = "course_table"
     extended_pkl_name = "extended_pkl"
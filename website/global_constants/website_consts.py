@@ -27,6 +27,15 @@ class WebsiteConsts:
     # Filter
     json_filter_dct = "json_filter_dct"
 
+    # Sort ranks
+    json_sort_ranks = "course_sort_ranks"
+    ascending = "ascending"
+    descending = "descending"
+
+    # Search index
+    json_search_index = "course_search_index"
+    search_trigrams = "trigrams"
+
     # Json dict names
     json_number = "course_numbers"
     json_name_english = "course_english_names"
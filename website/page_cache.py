@@ -0,0 +1,81 @@
+
+# Imports
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request, session, make_response
+# Helper functions and global constants
+from website.data_store import data_store
+from website.global_constants.config import Config
+
+
+class PageCache:
+    """ LRU cache of rendered pages, keyed by endpoint, view args, query args and data_store's version,
+        so cached pages are dropped as soon as the build publishes new files. The cache holds at most max_bytes
+        of page bodies, and bodies larger than max_page_bytes are not cached. Cached pages are served
+        with an ETag, and with 304 Not Modified if the browser already has that version """
+
+    def __init__(self, store=data_store, max_bytes=Config.website_page_cache_bytes, max_page_bytes=Config.website_page_cache_page_bytes):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_page_bytes = max_page_bytes
+        self._pages = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+
+    def cached(self, skip=None):
+        """ Decorator for GET views. skip(**view_args) can return True for pages that must not be cached.
+            POST requests, and pages rendered while a flash message is waiting to be shown, are never cached """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if (request.method != 'GET') or ('_flashes' in session) or (skip is not None and skip(**kwargs)):
+                    return view(*args, **kwargs)
+
+                # The views read the first value of each query arg (request.args.to_dict()), in url order
+                self.store.reload_if_changed()
+                cache_key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(request.args.to_dict().items()), self.store.version)
+                with self._lock:
+                    page = self._pages.get(cache_key)
+                    if page is not None:
+                        self._pages.move_to_end(cache_key)
+                if page is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough or ('_flashes' in session):
+                        return response
+                    body = response.get_data()
+                    page = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+                    if len(body) <= min(self.max_page_bytes, self.max_bytes):
+                        self._store(cache_key, page)
+
+                body, mimetype, etag = page
+                response = make_response(body)
+                response.mimetype = mimetype
+                response.set_etag(etag)
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._cached_bytes = 0
+
+
+    def _store(self, cache_key, page):
+        """Cache page, and drop the least recently used pages until the cache fits in max_bytes"""
+        with self._lock:
+            previous_page = self._pages.pop(cache_key, None)
+            if previous_page is not None:
+                self._cached_bytes -= len(previous_page[0])
+            self._pages[cache_key] = page
+            self._cached_bytes += len(page[0])
+            while self._cached_bytes > self.max_bytes:
+                _, dropped_page = self._pages.popitem(last=False)
+                self._cached_bytes -= len(dropped_page[0])
+
+
+page_cache = PageCache()
@@ -1,16 +1,32 @@
-
-
 # Imports
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 # Helper functions and global constants
+from website.page_cache import page_cache
+from website.search_index import search_index
+
+search = Blueprint('search', __name__)
+
+@search.route('/search/autocomplete', methods=['GET'])
+@page_cache.cached()
+def autocomplete():
+    """Return json list of {course, name} of the courses best matching the q url arg"""
+    return jsonify(search_index.suggestions(request.args.get('q', '')[:100]))
 
 def submit_search_field(search_field_input):
+    """Route to the course best matching the search (a course number, name or responsible), typos are allowed"""
+    search_field_input = (search_field_input or '').strip()
     if len(search_field_input) < 1:
         flash('Error: An empty search is not valid!', category='error')
         return redirect(url_for('course_database.route_to_course', course_number='invalid_search'))
-    elif len(search_field_input) > 5:
-        flash('Error: Search length exceeded the 5 character limit! Search a valid course number instead.', category='error')
+    elif len(search_field_input) > 100:
+        flash('Error: Search length exceeded the 100 character limit!', category='error')
+        return redirect(url_for('course_database.route_to_course', course_number='invalid_search'))
+
+    # Searches that are too short, or match several courses equally well, have no single course to go to
+    course = search_index.best_match(search_field_input)
+    if course is None:
+        flash(f'Error: No single course matched the search "{search_field_input}"! Search a course number or a longer part of its name instead.', category='error')
         return redirect(url_for('course_database.route_to_course', course_number='invalid_search'))
     else:
         #flash(f'Searching: {search_field_input}', category='success')
-        return redirect(url_for('course_database.route_to_course', course_number=search_field_input))
\ No newline at end of file
+        return redirect(url_for('course_database.route_to_course', course_number=course))
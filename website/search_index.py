@@ -0,0 +1,171 @@
+
+# Imports
+import re
+import threading
+import unicodedata
+import numpy as np
+# Helper functions and global constants
+from website.data_store import data_store
+from website.global_constants.config import Config
+from website.global_constants.website_consts import WebsiteConsts
+
+# The searchable fields of a course. The build stores each trigram of a field as ordinal * len(SEARCH_FIELDS) + field
+SEARCH_FIELDS = ['course', 'english_name', 'danish_name', 'responsible']
+SEARCH_FIELD_WEIGHTS = np.array([1.0, 1.0, 0.95, 0.9]) # A match in the course number or english name ranks first
+
+
+def normalize_search_text(text):
+    """Return the words of text in lower case and without accents (é becomes e, å becomes a), so search is not exact about them"""
+    text = unicodedata.normalize('NFKD', str(text).casefold())
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    return re.findall(r'\w+', text)
+
+
+def word_trigrams(word, is_prefix=False):
+    """ Return the trigrams of word, padded with $$ in front and $ at the end. The front padding makes short
+        words and prefixes searchable. A prefix (the word being typed) is not padded at the end, so it matches longer words """
+    padded_word = '$$' + word + ('' if is_prefix else '$')
+    return [padded_word[i:i + 3] for i in range (0, len(padded_word) - 2)]
+
+
+def create_search_postings(field_values):
+    """ Return {trigram: posting list} for field_values, a list for each field in SEARCH_FIELDS of the texts of each course.
+        A posting is ordinal * len(SEARCH_FIELDS) + field, and each posting list is sorted """
+    postings = {}
+    for field in range (0, len(field_values)):
+        for ordinal in range (0, len(field_values[field])):
+            trigrams = set()
+            for text in field_values[field][ordinal]:
+                for word in normalize_search_text(text):
+                    trigrams.update(word_trigrams(word))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(ordinal * len(SEARCH_FIELDS) + field)
+    # Sorted, so the json only changes when the searchable data changes
+    return {trigram: sorted(postings[trigram]) for trigram in sorted(postings)}
+
+
+class SearchIndex:
+    """ Trigram index of course numbers, english and danish names and responsible names, made by the build
+        (see search_index_creator). Each word of a query counts its trigrams found in the course's best matching field for
+        that word, so a query can mix e.g. a course number and a name. A course scores the share of the query's trigrams
+        it has counted, so a typo only costs the few trigrams it touches. The last word of a query matches as a prefix, for autocomplete.
+        Courses scoring at least min_score are ranked by score, with an exact course number always first.
+        The index is rebuilt whenever data_store has reloaded a file """
+
+    def __init__(self, store=data_store, min_score=Config.search_min_score, min_trigrams=Config.search_min_trigrams):
+        self.store = store
+        self.min_score = min_score
+        self.min_trigrams = min_trigrams
+        self._index = None
+        self._lock = threading.Lock()
+
+
+    def search(self, query, limit=Config.search_result_limit):
+        """Return list of up to limit courses matching query, best match first"""
+        index, scores, _ = self._scores(query)
+        if scores is None:
+            return []
+        ordinals = np.flatnonzero(scores >= self.min_score)
+        ordinals = ordinals[np.argsort(-scores[ordinals], kind='stable')][:limit]
+        return index['courses'][ordinals].tolist()
+
+
+    def best_match(self, query):
+        """ Return the course matching query best, or None if no course does. None is also returned when several courses
+            tie for the best score, unless one of them has a course number in the query, or an english name that is exactly
+            the query (several courses can share a name, the first one is picked). None is also returned when the query has
+            fewer than min_trigrams trigrams (a single letter is the start of a word of most courses), unless the query
+            is an exact course number """
+        index, scores, trigram_count = self._scores(query)
+        if scores is None:
+            return None
+        best_ordinal = int(scores.argmax())
+        best_score = scores[best_ordinal]
+        if best_score > SEARCH_FIELD_WEIGHTS.max():
+            return index['courses'][best_ordinal]
+        if trigram_count < self.min_trigrams or best_score < self.min_score:
+            return None
+
+        best_ordinals = np.flatnonzero(scores >= best_score - 1e-9).tolist()
+        if len(best_ordinals) == 1:
+            return index['courses'][best_ordinals[0]]
+        # Ties go to a course number in the query, then to a course with exactly the query as its name
+        words = normalize_search_text(query)
+        exact_ordinals = [index['ordinals'][word] for word in words if word in index['ordinals']]
+        exact_ordinals += index['names'].get(' '.join(words), [])
+        for ordinal in exact_ordinals:
+            if ordinal in best_ordinals:
+                return index['courses'][ordinal]
+        return None
+
+
+    def suggestions(self, query, limit=Config.search_result_limit):
+        """Return list of {course, name} of the courses matching query, for autocomplete"""
+        names = self.store.get(WebsiteConsts.json_name_english)
+        return [{'course': course, 'name': names.get(course, '')} for course in self.search(query, limit)]
+
+
+    def _scores(self, query):
+        """ Return (index, score of each course, number of trigrams in query). The scores are None if
+            none of the query's trigrams are in the index. An exact course number scores above any other course """
+        index = self._current_index()
+        words = normalize_search_text(query)
+        course_count = len(index['courses'])
+        scores = np.zeros(course_count)
+        trigram_count = 0
+        found = False
+        for i in range (0, len(words)):
+            trigrams = list(dict.fromkeys(word_trigrams(words[i], is_prefix=(i == len(words) - 1))))
+            trigram_count += len(trigrams)
+            postings = [index['postings'][trigram] for trigram in trigrams if trigram in index['postings']]
+            if postings == []:
+                continue
+            found = True
+            # Trigrams of the word in each field of each course, counted in the best weighted field of each course
+            field_counts = np.bincount(np.concatenate(postings), minlength=course_count * len(SEARCH_FIELDS)).reshape(course_count, len(SEARCH_FIELDS))
+            scores += (field_counts * SEARCH_FIELD_WEIGHTS).max(axis=1)
+        if not found:
+            return index, None, trigram_count
+        scores /= trigram_count
+        if len(words) == 1 and words[0] in index['ordinals']:
+            scores[index['ordinals'][words[0]]] = SEARCH_FIELD_WEIGHTS.max() + 1
+        return index, scores, trigram_count
+
+
+    def _current_index(self):
+        """Return the index, after rebuilding it if data_store has reloaded any files"""
+        self.store.reload_if_changed()
+        index = self._index
+        if index is None or index['version'] != self.store.version:
+            with self._lock:
+                if self._index is None or self._index['version'] != self.store.version:
+                    self._index = self._build()
+                index = self._index
+        return index
+
+
+    def _build(self):
+        """Turn the posting lists of the search index json into arrays"""
+        version = self.store.version
+        search_index = self.store.get(WebsiteConsts.json_search_index)
+        names = self.store.get(WebsiteConsts.json_name_english)
+        if WebsiteConsts.search_trigrams not in search_index:
+            # The build has not made the search index, so search the course numbers and english names
+            courses = list(self.store.get(WebsiteConsts.json_number).values())
+            field_values = [[[course] for course in courses], [[names.get(course, '')] for course in courses]]
+            search_index = {WebsiteConsts.json_number: courses, WebsiteConsts.search_trigrams: create_search_postings(field_values)}
+        courses = search_index[WebsiteConsts.json_number]
+        exact_names = {}
+        for i in range (0, len(courses)):
+            exact_names.setdefault(' '.join(normalize_search_text(names.get(courses[i], ''))), []).append(i)
+        postings = {}
+        for trigram, codes in search_index[WebsiteConsts.search_trigrams].items():
+            postings[trigram] = np.array(codes, dtype=np.int64)
+        return {'version': version,
+                'courses': np.array(courses, dtype=object),
+                'ordinals': {' '.join(normalize_search_text(courses[i])): i for i in range (0, len(courses))},
+                'names': exact_names, # Ordinals of the courses with each english name
+                'postings': postings}
+
+
+search_index = SearchIndex()
@@ -5,12 +5,14 @@ from flask import Blueprint, render_template, request
 # Helper functions and global constants
 from .search import submit_search_field
 from website.context_dicts import course_lists, dicts_to_display, data, current_args
+from website.page_cache import page_cache
 from website.global_constants.file_name_consts import FileNameConsts
 
 
 views = Blueprint('views', __name__)
 
 @views.route('/', methods=['GET', 'POST'])
+@page_cache.cached()
 def home():
     """This is the main homepage of the site"""
 
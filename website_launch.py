@@ -1,7 +1,13 @@
+# Imports
+import os
 # Helper functions and global constants
 from website import create_app
 
-app = create_app()
+# WEBSITE_PROFILE_STARTUP=1 prints how long each part of the startup takes
+if os.environ.get('WEBSITE_PROFILE_STARTUP') == '1':
+    app = create_app(profile_startup=True)
+else:
+    app = create_app()
 if __name__ == '__main__':
     app.run(debug = True)
-    #app.run(debug = True, host='82.211.205.140', port=8080)
\ No newline at end of file
+    #app.run(debug = True, host='82.211.205.140', port=8080)